@@ -0,0 +1,45 @@
+import os
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional, falls back to a character based estimate
+    tiktoken = None
+
+# context budget (tokens) for history + summary, per model
+MODEL_CONTEXT_BUDGETS = {
+    "openai/gpt-oss-120b": 6000,
+    "qwen/qwen3-32b": 4000,
+}
+DEFAULT_CONTEXT_BUDGET = 4000
+# overrides the per-model budgets when set
+CONTEXT_TOKEN_BUDGET = os.getenv("CONTEXT_TOKEN_BUDGET")
+
+# role markers and separators added by chat templates
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str | None) -> int:
+    if not text:
+        return MESSAGE_OVERHEAD_TOKENS
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=())) + MESSAGE_OVERHEAD_TOKENS
+    # roughly 4 characters per token for English text
+    return len(text) // 4 + 1 + MESSAGE_OVERHEAD_TOKENS
+
+
+def get_context_budget(model: str | None = None) -> int:
+    if CONTEXT_TOKEN_BUDGET:
+        return int(CONTEXT_TOKEN_BUDGET)
+    return MODEL_CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
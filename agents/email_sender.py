@@ -0,0 +1,228 @@
+import os
+import smtplib
+import socket
+import threading
+import time
+from email.message import EmailMessage
+from dotenv import load_dotenv
+from databases.email_outbox import EmailOutbox, OutboxSessionLocal, init_outbox_db
+
+load_dotenv()
+
+MAIL_ACCOUNT = os.getenv("MAIL_ACCOUNT")
+MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+# upgrade the connection with STARTTLS (turn off for a local test server such as aiosmtpd)
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", 30))
+# an unused SMTP connection is closed after this long
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", 60))
+# emails claimed and sent per round over one connection
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 20))
+# attempts before an email is marked failed
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+# retry delays double from the base up to the max
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", 3600))
+# how often the outbox is checked for due retries when nothing new was queued
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", 5))
+# a claimed email is handed to another sender if not finished within this time
+EMAIL_CLAIM_SECONDS = float(os.getenv("EMAIL_CLAIM_SECONDS", 300))
+
+# rejections of one message; the connection stays usable for the rest of the batch
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+# failures of the connection rather than of one message (SMTPException is an OSError)
+CONNECTION_ERRORS = (smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError,
+                     smtplib.SMTPServerDisconnected, smtplib.SMTPHeloError, OSError)
+
+
+def build_message(email) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = MAIL_ACCOUNT
+    message["To"] = email.recipient
+    message["Subject"] = email.subject
+    message.set_content(email.body)
+    return message
+
+
+def _is_permanent(error: Exception) -> bool:
+    # 5xx replies (unknown mailbox, rejected content) will fail the same way next time
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and code >= 500 and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+class EmailSender:
+    """
+    Delivers the email outbox off the request path.
+    One background thread claims due emails in batches and sends them over a single
+    authenticated SMTP connection that is kept open between batches. Temporary failures
+    are retried with exponential backoff, permanent ones (5xx) fail the email at once.
+    """
+
+    def __init__(self, batch_size: int = EMAIL_BATCH_SIZE, poll_seconds: float = EMAIL_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        # claims in the outbox are owned by this id; set when the thread starts, so forked workers differ
+        self.sender_id = None
+        self._smtp = None
+        self._smtp_used_at = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections = 0
+        self.last_error = None
+
+    # queueing
+
+    def submit(self, recipient: str, subject: str, body: str):
+        """Persist the email in the outbox and wake the sender, returns the outbox row"""
+        self.start()
+        db = OutboxSessionLocal()
+        try:
+            email = EmailOutbox(db).enqueue(recipient, subject, body)
+        finally:
+            db.close()
+        self._wake.set()
+        return email
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            init_outbox_db()
+            self.sender_id = f"{socket.gethostname()}:{os.getpid()}"
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="email-sender", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        thread.join(timeout=timeout)
+
+    # SMTP connection
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+            try:
+                if SMTP_STARTTLS:
+                    smtp.starttls()
+                if MAIL_ACCOUNT and MAIL_PASSWORD:
+                    smtp.login(MAIL_ACCOUNT, MAIL_PASSWORD)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self.connections += 1
+        return self._smtp
+
+    def _close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
+    def _deliver(self, message: EmailMessage):
+        # a kept-open connection may have been dropped by the server, reconnect once
+        for retry in (False, True):
+            smtp = self._connection()
+            try:
+                smtp.send_message(message)
+                self._smtp_used_at = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._close()
+                if retry:
+                    raise
+
+    # delivery loop
+
+    def _retry_in(self, email):
+        if email.attempts + 1 >= EMAIL_MAX_ATTEMPTS:
+            return None
+        return min(EMAIL_RETRY_BASE_SECONDS * 2 ** email.attempts, EMAIL_RETRY_MAX_SECONDS)
+
+    def _fail(self, outbox: EmailOutbox, email, error: Exception, permanent: bool = False):
+        retry_in = None if permanent else self._retry_in(email)
+        outbox.mark_failed(email, f"{type(error).__name__}: {error}", retry_in)
+        self.last_error = str(error)
+        if retry_in is None:
+            self.failed += 1
+        else:
+            self.retried += 1
+
+    def _drain(self):
+        """Send due emails batch by batch until none are left or the server is unreachable"""
+        while not self._stop.is_set():
+            db = OutboxSessionLocal()
+            try:
+                outbox = EmailOutbox(db)
+                batch = outbox.claim(self.sender_id, self.batch_size, EMAIL_CLAIM_SECONDS)
+                if not batch:
+                    return
+                for i, email in enumerate(batch):
+                    try:
+                        self._deliver(build_message(email))
+                    except MESSAGE_ERRORS as e:
+                        self._fail(outbox, email, e, permanent=_is_permanent(e))
+                    except CONNECTION_ERRORS as e:
+                        self._close()
+                        # nothing else can go out over this server right now
+                        for pending in batch[i:]:
+                            self._fail(outbox, pending, e)
+                        return
+                    except Exception as e:
+                        # a message that can not be built (bad header) will never go out
+                        self._fail(outbox, email, e, permanent=True)
+                    else:
+                        outbox.mark_sent(email)
+                        self.sent += 1
+            finally:
+                db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self._drain()
+            except Exception as e:
+                self.last_error = str(e)
+            if self._smtp is not None and time.monotonic() - self._smtp_used_at > SMTP_IDLE_SECONDS:
+                self._close()
+            self._wake.wait(self.poll_seconds)
+        self._close()
+
+    def metrics(self) -> dict:
+        db = OutboxSessionLocal()
+        try:
+            outbox = EmailOutbox(db).counts()
+        finally:
+            db.close()
+        return {
+            "outbox": outbox,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "smtp_connections": self.connections,
+            "connected": self._smtp is not None,
+            "last_error": self.last_error,
+            "running": self._thread is not None,
+        }
+
+
+email_sender = EmailSender()
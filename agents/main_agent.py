@@ -1,19 +1,14 @@
-from langchain.agents import create_agent
-from langchain_groq import ChatGroq
+import asyncio
+from functools import lru_cache
 from .tools import get_tools
+from .router import MAIN, route_query, run_route
 from langchain_core.messages import HumanMessage
-from langchain_ollama import OllamaLLM
 from dotenv import load_dotenv
+from metrics import metrics_callback, traced
 load_dotenv()
 
 
-llm = ChatGroq(
-    model="openai/gpt-oss-120b",
-    temperature=0.0,
-    verbose=True,
-)
-
-# llm = OllamaLLM(model="gemma:2b", temperature=0.0)  # for testing "doesn't support tools"
+MODEL_NAME = "openai/gpt-oss-120b"
 
 system_prompt = """
 You are personal assistant — practical, concise, reliable.
@@ -22,20 +17,155 @@ Alwyays use tools when needed to help the user.
 Help effectively and stay on topic.
 """
 
-main_agent = create_agent(
-model=llm, 
-tools=get_tools(),
-system_prompt=system_prompt,
-)
 
-def call_main_agent(query: str, chat_history: list) -> str:
+# The LLM client and the agent graph are built on first use (or by warmup()),
+# importing this module stays cheap.
+@lru_cache(maxsize=1)
+def get_llm():
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model=MODEL_NAME,
+        temperature=0.0,
+        verbose=True,
+        # lets the streaming endpoint tell main agent tokens apart from sub-agent LLM calls
+        tags=["main_agent"],
+        callbacks=[metrics_callback],
+    )
+
+
+@lru_cache(maxsize=1)
+def get_main_agent():
+    from langchain.agents import create_agent
+    from .tool_execution import ToolTimeoutMiddleware
+
+    # tool calls of one model step run concurrently, each bounded by its own timeout
+    return create_agent(
+        model=get_llm(),
+        tools=get_tools(),
+        system_prompt=system_prompt,
+        middleware=[ToolTimeoutMiddleware()],
+    )
+
+
+def warmup():
+    """Build every LLM client, agent, schema digest and the notes vector index ahead of the first request"""
+    from .sql_agent import get_sql_agent
+    from .summarization_agent import get_summarization_chain
+    from databases.notes_vector_index import notes_vector_index
+
+    get_main_agent()
+    get_sql_agent()
+    get_summarization_chain()
+    notes_vector_index.sync()
+
+
+def _build_messages(query: str, chat_history: list):
     messages = HumanMessage(content=query)
     if len(chat_history) > 0:
         messages = chat_history + [messages]
-    response = main_agent.invoke({"messages": messages})
+    return messages
+
+
+# tool runs inherit the callback from the invocation config, LLM calls get it from the client
+AGENT_CONFIG = {"callbacks": [metrics_callback]}
+
+
+def call_main_agent(query: str, chat_history: list) -> str:
+    decision = route_query(query, chat_history)
+    if decision["route"] != MAIN:
+        return run_route(decision, query)
+    return _invoke_main_agent(query, chat_history)
+
+
+@traced("main_agent")
+def _invoke_main_agent(query: str, chat_history: list) -> str:
+    response = get_main_agent().invoke({"messages": _build_messages(query, chat_history)}, config=AGENT_CONFIG)
+    return response["messages"][-1].content
+
+
+def _route_and_run(query: str, chat_history: list):
+    """Routing decision, and the answer when the request does not go to the main agent"""
+    decision = route_query(query, chat_history)
+    if decision["route"] != MAIN:
+        return decision, run_route(decision, query)
+    return decision, None
+
+
+async def acall_main_agent(query: str, chat_history: list) -> str:
+    # clearly notes-only requests skip the main agent's two reasoning passes;
+    # routing logs and may embed the query, so it runs off the event loop like the routed call
+    decision, answer = await asyncio.to_thread(_route_and_run, query, chat_history)
+    if decision["route"] != MAIN:
+        return answer
+    return await _ainvoke_main_agent(query, chat_history)
+
+
+@traced("main_agent")
+async def _ainvoke_main_agent(query: str, chat_history: list) -> str:
+    # native async invocation so the API event loop stays free while the LLM works
+    main_agent = await asyncio.to_thread(get_main_agent)
+    response = await main_agent.ainvoke({"messages": _build_messages(query, chat_history)}, config=AGENT_CONFIG)
     return response["messages"][-1].content
 
 
+async def astream_main_agent(query: str, chat_history: list):
+    """
+    Run the main agent and yield progress events as they happen:
+    {"type": "token", "content": ...} for answer tokens,
+    {"type": "tool_start" | "tool_end", "name": ...} for tool calls,
+    and a final {"type": "final", "content": ...} with the full answer.
+    A routed request reports its notes call as one tool and its answer as one token.
+    """
+    decision = await asyncio.to_thread(route_query, query, chat_history)
+    if decision["route"] != MAIN:
+        name = decision["tool"] or "database_agent"
+        yield {"type": "tool_start", "name": name, "input": decision["args"] or {"query": query}}
+        answer = await asyncio.to_thread(run_route, decision, query)
+        yield {"type": "tool_end", "name": name, "output": str(answer)[:500]}
+        yield {"type": "token", "content": answer}
+        yield {"type": "final", "content": answer}
+        return
+    async for event in _astream_main_agent(query, chat_history):
+        yield event
+
+
+@traced("main_agent")
+async def _astream_main_agent(query: str, chat_history: list):
+    main_agent = await asyncio.to_thread(get_main_agent)
+    answer = []
+    final = None
+    async for event in main_agent.astream_events(
+        {"messages": _build_messages(query, chat_history)}, config=AGENT_CONFIG, version="v2"
+    ):
+        kind = event["event"]
+        is_main_llm = "main_agent" in event.get("tags", [])
+        if kind == "on_chat_model_start" and is_main_llm:
+            # each model step starts a new candidate answer, the last one wins
+            answer = []
+        elif kind == "on_chat_model_end" and is_main_llm:
+            # the complete message of the step, also when the model did not stream tokens
+            content = getattr(event["data"].get("output"), "content", None)
+            final = content if isinstance(content, str) else None
+        elif kind == "on_chat_model_stream" and is_main_llm:
+            content = event["data"]["chunk"].content
+            if isinstance(content, str) and content:
+                answer.append(content)
+                yield {"type": "token", "content": content}
+        elif kind == "on_tool_start":
+            yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input")}
+        elif kind == "on_tool_end":
+            output = event["data"].get("output")
+            output = getattr(output, "content", output)
+            yield {"type": "tool_end", "name": event["name"], "output": str(output)[:500]}
+    streamed = "".join(answer)
+    if not final:
+        final = streamed
+    elif not streamed:
+        yield {"type": "token", "content": final}
+    yield {"type": "final", "content": final}
+
+
 if __name__ == "__main__":
     while True:
         user_input = input("User: ")
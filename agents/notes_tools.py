@@ -0,0 +1,173 @@
+from typing import List, Optional
+from langchain_core.tools import tool
+from databases.notes_database import NotesManager, NotesSessionLocal, search_notes as search_notes_index
+
+
+def _describe_note(note, preview: int = 200) -> str:
+    tags = ", ".join(sorted(tag.name for tag in note.tags))
+    archived = " (archived)" if note.is_archived else ""
+    content = note.content if len(note.content) <= preview else note.content[:preview] + "…"
+    created = note.created_at.strftime("%Y-%m-%d %H:%M") if note.created_at else ""
+    return (f"#{note.id} {note.title or '(untitled)'}{archived} [{tags}] {created}\n"
+            f"    {content}")
+
+
+def _describe_notes(notes) -> str:
+    if not notes:
+        return "No notes found."
+    return "\n".join(_describe_note(note) for note in notes)
+
+
+def _format_notes(rows: list) -> str:
+    if not rows:
+        return "No matching notes."
+    lines = []
+    for row in rows:
+        archived = " (archived)" if row.get("is_archived") else ""
+        lines.append(f"#{row['id']} {row.get('title') or '(untitled)'}{archived}: {row.get('snippet') or ''}")
+    return "\n".join(lines)
+
+
+@tool("search_notes",
+    description=(
+        "Full-text search over the user's notes (titles and contents), ranked by relevance. "
+        "Use it to find notes mentioning words or topics. Matches in the snippet are wrapped in [ ]. "
+        "Returns note ids, titles and snippets."
+    )
+)
+def search_notes(query: str, limit: int = 5, include_archived: bool = False) -> str:
+    """
+    Args:
+        query: Words to look for.
+        limit: Maximum number of notes to return.
+        include_archived: Also search archived notes.
+    """
+    return _format_notes(search_notes_index(query, limit=limit, include_archived=include_archived))
+
+
+@tool("semantic_search_notes",
+    description=(
+        "Find the user's notes by meaning rather than exact words, e.g. 'what did I write about hiring'. "
+        "Runs on a local index in milliseconds. Use search_notes when exact words matter. "
+        "Returns note ids, titles, similarity scores and the start of each note."
+    )
+)
+def semantic_search_notes(query: str, limit: int = 5, include_archived: bool = False) -> str:
+    """
+    Args:
+        query: What the notes should be about.
+        limit: Maximum number of notes to return.
+        include_archived: Also search archived notes.
+    """
+    db = NotesSessionLocal()
+    try:
+        rows = NotesManager(db).semantic_search(query, limit=limit, include_archived=include_archived)
+    finally:
+        db.close()
+    for row in rows:
+        row["snippet"] = f"({row['score']:.2f}) {row['snippet']}"
+    return _format_notes(rows)
+
+
+@tool("add_note",
+    description="Create a new note with optional title and tags. Returns the created note."
+)
+def add_note(content: str, title: Optional[str] = None, tags: Optional[List[str]] = None) -> str:
+    """
+    Args:
+        content: Body of the note.
+        title: Optional title.
+        tags: Optional list of tag names, e.g. ["work", "ideas"].
+    """
+    db = NotesSessionLocal()
+    try:
+        return "Created note:\n" + _describe_note(NotesManager(db).create_note(content, title=title, tags=tags))
+    finally:
+        db.close()
+
+
+@tool("update_note",
+    description=(
+        "Update an existing note by id. Only the given fields change; "
+        "tags replaces the note's whole tag list."
+    )
+)
+def update_note(note_id: int, title: Optional[str] = None, content: Optional[str] = None,
+                tags: Optional[List[str]] = None) -> str:
+    """
+    Args:
+        note_id: Id of the note (as shown by the other note tools, e.g. #12 -> 12).
+        title: New title.
+        content: New content.
+        tags: New list of tag names.
+    """
+    db = NotesSessionLocal()
+    try:
+        note = NotesManager(db).update_note(note_id, title=title, content=content, tags=tags)
+        return "Updated note:\n" + _describe_note(note) if note else f"Note #{note_id} not found."
+    finally:
+        db.close()
+
+
+@tool("archive_note",
+    description="Archive (or with archived=false, restore) a note, identified by id or by exact title."
+)
+def archive_note(note_id: Optional[int] = None, title: Optional[str] = None, archived: bool = True) -> str:
+    """
+    Args:
+        note_id: Id of the note.
+        title: Title of the note, used when the id is not known.
+        archived: False to un-archive.
+    """
+    db = NotesSessionLocal()
+    try:
+        manager = NotesManager(db)
+        if note_id is None and title:
+            found = manager.find_note_by_title(title)
+            note_id = found.id if found else None
+        if note_id is None:
+            return "Note not found."
+        note = manager.archive_note(note_id, archived=archived)
+        if not note:
+            return f"Note #{note_id} not found."
+        return ("Archived note:\n" if archived else "Restored note:\n") + _describe_note(note)
+    finally:
+        db.close()
+
+
+@tool("list_recent_notes",
+    description="List the most recently created notes, newest first."
+)
+def list_recent_notes(limit: int = 5, include_archived: bool = False) -> str:
+    """
+    Args:
+        limit: Number of notes to return.
+        include_archived: Also list archived notes.
+    """
+    db = NotesSessionLocal()
+    try:
+        return _describe_notes(NotesManager(db).list_recent(limit=limit, include_archived=include_archived))
+    finally:
+        db.close()
+
+
+@tool("list_notes_by_tag",
+    description="List notes that carry a given tag, newest first."
+)
+def list_notes_by_tag(tag: str, limit: int = 10, include_archived: bool = False) -> str:
+    """
+    Args:
+        tag: Tag name, e.g. "work".
+        limit: Number of notes to return.
+        include_archived: Also list archived notes.
+    """
+    db = NotesSessionLocal()
+    try:
+        return _describe_notes(NotesManager(db).list_by_tag(tag, limit=limit, include_archived=include_archived))
+    finally:
+        db.close()
+
+
+def get_notes_tools():
+    return [add_note, update_note, archive_note, list_recent_notes, list_notes_by_tag, search_notes,
+            semantic_search_notes]
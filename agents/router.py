@@ -0,0 +1,220 @@
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from metrics import Counter, metrics_callback, registry, traced
+from .notes_tools import list_notes_by_tag, list_recent_notes, search_notes
+from .sql_agent import call_sql_agent
+
+# send clearly notes-only requests straight to the notes service / SQL agent, skipping the main agent
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1").lower() in ("1", "true", "yes")
+# let a small local classifier decide the requests the rules leave open
+ROUTER_CLASSIFIER = os.getenv("ROUTER_CLASSIFIER", "0").lower() in ("1", "true", "yes")
+# how much closer to the notes examples than to the others a query must be to be routed
+ROUTER_CLASSIFIER_MARGIN = float(os.getenv("ROUTER_CLASSIFIER_MARGIN", 0.1))
+# extra labelled examples for the classifier, JSON lines {"query": ..., "label": "notes" | "main"}
+ROUTER_TRAINING_PATH = os.getenv("ROUTER_TRAINING_PATH", "")
+# every routing decision, with the query text, is appended here as a JSON line for offline evaluation (empty: off)
+ROUTER_LOG_PATH = os.getenv("ROUTER_LOG_PATH", "")
+
+MAIN = "main"
+SQL_AGENT = "sql_agent"
+NOTES_SERVICE = "notes_service"
+
+# requests about the user's own notes; a bare "notes" or "tags" may mean anything (meta tags,
+# git tags, musical notes, note-taking apps), and the SQL agent may write and answers verbatim,
+# so only these shapes skip the main agent and anything unsure stays with it
+_NOTE = r"(?:notes?|notebook|tags?)\b(?!-)"
+# "my notes", "my archived notes", "my 10 latest notes", "my most used tags"
+_MY_NOTES = re.compile(
+    r"\bmy\s+(?:(?:\d+|archived|unarchived|recent|latest|last|newest|oldest|old|new|saved|own|"
+    r"pinned|most|least|used|frequent|popular|work|personal)\s+){0,3}" + _NOTE,
+    re.I,
+)
+# "how many notes do I have", "notes I took yesterday", "tags I used"
+_NOTES_I_KEPT = re.compile(
+    r"\b(?:notes?|tags?)\s+(?:that\s+)?(?:do\s+|did\s+)?i\s+"
+    r"(?:have|had|wrote|took|saved|added|created|archived)\b"
+    r"|\btags?\s+(?:that\s+)?(?:do\s+|did\s+)?i\s+(?:use|used)\b",
+    re.I,
+)
+# "add a note about milk", "delete the notes tagged draft", "rename the tag ideas to brainstorm";
+# the object must end the request or go on with what a note is made of, never "to my landlord",
+# "on the french revolution" or "in my blog post"
+_NOTES_COMMAND = re.compile(
+    r"^(?:please\s+)?(?:add|create|save|take|delete|remove|archive|unarchive|update|edit|rename|count)"
+    r"\s+(?:(?:a|an|the|new|all|every|some|my)\s+)*(?:archived\s+)?(?:notes?|tags?)\b(?!-)"
+    r"(?:[\s?.!]*$|\s*:|\s+['\"]"
+    r"|\s+(?:about|titled|called|named|tagged|saying|containing|mentioning|with\s+(?:the\s+)?(?:tag|title))\b"
+    r"|(?<=tag)\s+['\"]?[\w-]+['\"]?\s+to\s+['\"]?[\w-]+['\"]?[\s?.!]*$)",
+    re.I,
+)
+# anything the notes database can not answer on its own
+_OTHER_CAPABILITIES = re.compile(
+    r"\b(e-?mails?|mail|send|web|internet|online|google|news|headlines?|weather|forecast|"
+    r"translate|summari[sz]e|explain|remind(er)?|https?)\b|@",
+    re.I,
+)
+_ADVICE = re.compile(
+    r"\b(how (should|do|can|could|would) (i|you|we)|advice|tips?|best way|recommend\w*|(give|suggest) (me )?(some )?ideas?|why)\b", re.I)
+# references that only the conversation can resolve
+_REFERENCES = re.compile(
+    r"\b(it|its|those|these|them|above|previous|again|same|last one)\b|\b(that|this)\s+(one|note|tag)\b", re.I)
+_FOLLOW_UP = re.compile(r"^\s*(and|also|what about|how about|ok|okay|then|same)\b", re.I)
+
+_LIST_RECENT = re.compile(
+    r"^(?:please\s+)?(?:show|list|get|display|give)(?:\s+me)?(?:\s+my|\s+the)?"
+    r"(?:\s+(?:last|latest|recent|newest|most recent))?(?:\s+(\d{1,3}))?(?:\s+(?:last|latest|recent|newest))?"
+    r"\s+notes?[\s?.!]*$",
+    re.I,
+)
+_LIST_BY_TAG = re.compile(
+    r"^(?:please\s+)?(?:show|list|get|display|give)(?:\s+me)?(?:\s+(?:all|my|the))*\s+notes?\s+"
+    r"(?:tagged(?:\s+with|\s+as)?|with(?:\s+the)?\s+tag|under(?:\s+the)?\s+tag)\s+['\"]?([\w-]+)['\"]?[\s?.!]*$",
+    re.I,
+)
+_SEARCH = re.compile(
+    r"^(?:please\s+)?(?:search|find|look\s+up|look\s+for)(?:\s+(?:in|through))?(?:\s+(?:all|my|the))*\s+notes?\s+"
+    r"(?:for|about|mentioning|containing|on|with)\s+['\"]?(.+?)['\"]?[\s?.!]*$",
+    re.I,
+)
+
+# seed examples of the classifier, extended by ROUTER_TRAINING_PATH
+NOTES_EXAMPLES = [
+    "what did I write about the hiring plan",
+    "how many notes did I create this week",
+    "which notes mention the budget",
+    "delete everything tagged draft",
+    "rename the tag ideas to brainstorm",
+    "what was my idea for the onboarding flow",
+    "did I save anything about the dentist",
+    "find what I wrote on the quarterly review",
+    "count my archived notes",
+    "list the titles I wrote last month",
+    "what are my most used tags",
+    "show everything I wrote yesterday",
+]
+MAIN_EXAMPLES = [
+    "what time is it in tokyo",
+    "who won the match last night",
+    "write a poem about autumn",
+    "what is the capital of australia",
+    "help me plan a trip to rome",
+    "how do I reverse a list in python",
+    "tell me a joke",
+    "what's the latest news about the elections",
+    "draft a reply to my manager",
+    "what is the weather tomorrow",
+    "thanks, that was helpful",
+    "explain how vaccines work",
+]
+
+router_decisions = registry.register(Counter(
+    "router_decisions_total", "Routing decisions of the pre-router", ("route", "reason")))
+
+_log_lock = threading.Lock()
+
+
+def _decision(route: str, reason: str, score: float = None, tool=None, args: dict = None) -> dict:
+    return {"route": route, "reason": reason, "score": score, "tool": tool, "args": args or {}}
+
+
+def _notes_service(query: str):
+    """Deterministic notes operations that need no LLM at all"""
+    match = _LIST_BY_TAG.match(query)
+    if match:
+        return _decision(NOTES_SERVICE, "rule:list_by_tag", tool="list_notes_by_tag", args={"tag": match.group(1)})
+    match = _SEARCH.match(query)
+    if match:
+        return _decision(NOTES_SERVICE, "rule:search", tool="search_notes", args={"query": match.group(1)})
+    match = _LIST_RECENT.match(query)
+    if match:
+        limit = int(match.group(1)) if match.group(1) else 5
+        return _decision(NOTES_SERVICE, "rule:list_recent", tool="list_recent_notes", args={"limit": limit})
+    return None
+
+
+def _load_examples() -> tuple:
+    notes, main = list(NOTES_EXAMPLES), list(MAIN_EXAMPLES)
+    if ROUTER_TRAINING_PATH and os.path.exists(ROUTER_TRAINING_PATH):
+        with open(ROUTER_TRAINING_PATH) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                example = json.loads(line)
+                (notes if example.get("label") == "notes" else main).append(example["query"])
+    return notes, main
+
+
+@lru_cache(maxsize=1)
+def get_classifier():
+    """Centroids of the labelled examples in the notes index's hashed feature space"""
+    from databases.notes_vector_index import embed
+
+    notes, main = _load_examples()
+    centroids = []
+    for examples in (notes, main):
+        centroid = embed([[(example, 1.0)] for example in examples]).mean(axis=0)
+        centroids.append(centroid / max(float((centroid ** 2).sum()) ** 0.5, 1e-9))
+    return embed, centroids
+
+
+def classify(query: str) -> float:
+    """Similarity to the notes examples minus similarity to the other examples"""
+    embed, (notes_centroid, main_centroid) = get_classifier()
+    vector = embed([[(query, 1.0)]])[0]
+    return float(vector @ notes_centroid - vector @ main_centroid)
+
+
+def route_query(query: str, chat_history: list) -> dict:
+    """
+    Decide who answers: MAIN (the main agent), SQL_AGENT (the notes SQL agent, answer returned
+    verbatim) or NOTES_SERVICE (a note tool called directly). Anything that is not clearly
+    about the user's own notes stays with the main agent. Blocking (decision log, classifier),
+    async callers run it in a thread.
+    """
+    text = query.strip()
+    if not ROUTER_ENABLED:
+        decision = _decision(MAIN, "disabled")
+    elif _OTHER_CAPABILITIES.search(text):
+        decision = _decision(MAIN, "rule:other_capability")
+    elif _ADVICE.search(text):
+        decision = _decision(MAIN, "rule:advice")
+    elif _REFERENCES.search(text) or (chat_history and _FOLLOW_UP.search(text)):
+        decision = _decision(MAIN, "rule:needs_context")
+    elif (service := _notes_service(text)) is not None:
+        decision = service
+    elif _MY_NOTES.search(text) or _NOTES_I_KEPT.search(text) or _NOTES_COMMAND.match(text):
+        decision = _decision(SQL_AGENT, "rule:my_notes")
+    elif ROUTER_CLASSIFIER:
+        score = classify(text)
+        route = SQL_AGENT if score >= ROUTER_CLASSIFIER_MARGIN else MAIN
+        decision = _decision(route, "classifier", score=score)
+    else:
+        decision = _decision(MAIN, "rule:default")
+    router_decisions.inc(route=decision["route"], reason=decision["reason"])
+    log_decision(query, decision, bool(chat_history))
+    return decision
+
+
+def log_decision(query: str, decision: dict, has_history: bool):
+    if not ROUTER_LOG_PATH:
+        return
+    record = {"ts": time.time(), "query": query[:500], "has_history": has_history, **decision}
+    line = json.dumps(record, default=str) + "\n"
+    with _log_lock:
+        with open(ROUTER_LOG_PATH, "a") as f:
+            f.write(line)
+
+
+NOTES_SERVICE_TOOLS = {tool.name: tool for tool in (list_recent_notes, list_notes_by_tag, search_notes)}
+
+
+@traced("routed")
+def run_route(decision: dict, query: str) -> str:
+    """Answer a query routed away from the main agent; the result is returned to the user as is"""
+    if decision["route"] == NOTES_SERVICE:
+        return NOTES_SERVICE_TOOLS[decision["tool"]].invoke(decision["args"], config={"callbacks": [metrics_callback]})
+    return call_sql_agent(query)
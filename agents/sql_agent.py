@@ -1,59 +1,34 @@
-from langchain_groq import ChatGroq
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from dotenv import load_dotenv
-from langchain.agents import create_agent
-from databases.notes_database import db
+from functools import lru_cache
+from databases.notes_database import get_sql_database, get_schema_digest
+from .notes_tools import search_notes
+from .sql_plan_cache import sql_plan_cache, executed_queries, SQL_PLAN_CACHE_ENABLED
+from metrics import metrics_callback, traced
+from langchain_core.messages import ToolMessage
+from sqlalchemy.exc import SQLAlchemyError
+import threading
 load_dotenv()
 
+# name of the SQL query tool, the only tool whose runs make a cacheable plan
+QUERY_TOOL_NAME = "sql_db_query"
+# characters of a single value shown in a cached answer
+MAX_CELL_CHARS = 100
 
 
-llm = ChatGroq(
-    model="qwen/qwen3-32b",
-    temperature=0.0,
-    verbose=True,
-)
+@lru_cache(maxsize=1)
+def get_llm():
+    from langchain_groq import ChatGroq
 
-# we take the db form the notes_database.py since the path is already set up there
-# from langchain_community.utilities import SQLDatabase
-# db = SQLDatabase.from_uri(NOTES_DATABASE_URL)
+    return ChatGroq(
+        model="qwen/qwen3-32b",
+        temperature=0.0,
+        verbose=True,
+        callbacks=[metrics_callback],
+    )
 
-# print(f"Dialect: {db.dialect}")
-# print(f"Available Tables: {db.get_usable_table_names()}")
-# print(f"Sample Output: {db.run("SELECT * FROM Artist LIMIT 5;")}")
-
-
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-tools = toolkit.get_tools()
-
-# for tool in tools:
-#   print(f"Tool Name: {tool.name} \nDescription: {tool.description}\n")
-
-# no dml statements allowed
-langchain_sql_prompt = """
-You are an agent designed to interact with a SQL database.
-Given an input question, create a syntactically correct {dialect} query to run,
-then look at the results of the query and return the answer. Unless the user
-specifies a specific number of examples they wish to obtain, always limit your
-query to at most {top_k} results.
-
-You can order the results by a relevant column to return the most interesting
-examples in the database. Never query for all the columns from a specific table,
-only ask for the relevant columns given the question.
-
-You MUST double check your query before executing it. If you get an error while
-executing a query, rewrite the query and try again.
-
-DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the
-database.
-
-To start you should ALWAYS look at the tables in the database to see what you
-can query. Do NOT skip this step.
-
-Then you should query the schema of the most relevant tables.
-""".format(
-    dialect=db.dialect,
-    top_k=5,
-)
+# The notes schema is injected into the prompt (see get_schema_digest), so the agent only
+# gets the query tool plus the schema tool as a fallback. The list-tables tool and the
+# LLM-backed query checker were dropped: each cost an extra model round trip per request.
 
 system_prompt = """
 You are an expert SQL agent that can fully interact with a database.
@@ -61,13 +36,23 @@ You are an expert SQL agent that can fully interact with a database.
 Current database dialect: {dialect}
 Default row limit (for SELECT): {top_k}
 
+Database schema (complete and up to date, do NOT rediscover it):
+{schema}
+
 Follow this strict sequence:
-1. Start by discovering available tables (use list_tables or equivalent tool)
-2. Then inspect schema of relevant tables (use schema tool)
-3. Generate correct {dialect} SQL for the user's request
-4. Double-check syntax and logic before execution
-5. Execute the query and get results
-6. If error occurs → analyze it, fix the query, retry (max 3 attempts)
+1. Generate correct {dialect} SQL for the user's request using the schema above
+2. Double-check syntax and logic before execution
+3. Execute the query and get results
+4. If error occurs → analyze it, fix the query, retry (max 3 attempts).
+   Only use the schema tool if the error shows the schema above is wrong.
+
+To find notes by words or topic, prefer the search_notes tool over LIKE '%...%' queries:
+it uses a ranked full-text index and returns note ids you can use in follow-up SQL.
+The notes_fts table is maintained by triggers, never write to it directly.
+
+Query results are capped: long results end with a "[truncated: ...]" line. When you see it,
+narrow the query (filters, fewer columns, LIMIT) instead of trying to read everything.
+Statements that run too long are interrupted; simplify them rather than retrying unchanged.
 
 Allowed statements:
 • SELECT (always limit to ≤ {top_k} rows unless user specifies otherwise)
@@ -81,21 +66,95 @@ After execution:
 - Always explain what was done in natural language
 
 Current dialect: {dialect}
-Start by examining the database structure.
-""".format(
-    dialect=db.dialect,
-    top_k=5,
-)
-
-
-sql_agent = create_agent(
-    model=llm,
-    tools=tools,
-    system_prompt=system_prompt,
-  )
-
+"""
+
+_agent_lock = threading.Lock()
+_agent_cache = {"version": None, "agent": None}
+
+
+def get_sql_agent():
+    """SQL agent built around the current schema digest, rebuilt when the DDL changes"""
+    version, schema = get_schema_digest()
+    with _agent_lock:
+        if _agent_cache["agent"] is None or _agent_cache["version"] != version:
+            from langchain.agents import create_agent
+            from langchain_community.tools.sql_database.tool import InfoSQLDatabaseTool
+            from .sql_query_tool import RecordingQuerySQLDatabaseTool
+
+            db = get_sql_database()
+            _agent_cache["agent"] = create_agent(
+                model=get_llm(),
+                tools=[RecordingQuerySQLDatabaseTool(db=db), InfoSQLDatabaseTool(db=db), search_notes],
+                system_prompt=system_prompt.format(dialect=db.dialect, top_k=5, schema=schema),
+            )
+            _agent_cache["version"] = version
+        return _agent_cache["agent"]
+
+
+def _format_value(value) -> str:
+    text = str(value)
+    if len(text) > MAX_CELL_CHARS:
+        text = text[:MAX_CELL_CHARS - 3] + "..."
+    return text.replace("|", "\\|").replace("\n", " ")
+
+
+def format_rows(columns: list, rows: list, truncated: bool) -> str:
+    """Rows of a cached plan as the agent would present them: a single value, or a table"""
+    if not rows:
+        return "No matching rows."
+    if len(columns) == 1 and len(rows) == 1:
+        return f"{columns[0]}: {_format_value(rows[0][0])}"
+    lines = ["| " + " | ".join(columns) + " |", "|" + " --- |" * len(columns)]
+    lines += ["| " + " | ".join(_format_value(value) for value in row) + " |" for row in rows]
+    if truncated:
+        lines.append(f"\nOnly the first {len(rows)} rows are shown.")
+    return "\n".join(lines)
+
+
+def _cached_answer(query: str, version):
+    hit = sql_plan_cache.lookup(query, version)
+    if hit is None:
+        return None
+    sql, params = hit
+    try:
+        columns, rows, truncated = get_sql_database().fetch_rows(sql, parameters=params)
+    except SQLAlchemyError:
+        return None
+    return format_rows(columns, rows, truncated)
+
+
+def _remember_plan(query: str, version, executed: list, tools_used: set):
+    # only pure reads that ran as a single statement, with no other tool feeding it values
+    # (note ids from search_notes), are replayable
+    if len(executed) != 1 or tools_used - {QUERY_TOOL_NAME}:
+        return
+    sql, result = executed[0]
+    db = get_sql_database()
+    sql_plan_cache.store(
+        query, version, sql,
+        validate=lambda template, params: db.run_no_throw(template, parameters=params) == result,
+    )
+
+
+@traced("sql_agent")
 def call_sql_agent(query: str) -> str:
-    response = sql_agent.invoke({"messages": [{"role": "user", "content": query}]})
+    version, _ = get_schema_digest()
+    if SQL_PLAN_CACHE_ENABLED:
+        cached = _cached_answer(query, version)
+        if cached is not None:
+            return cached
+
+    executed = []
+    token = executed_queries.set(executed)
+    try:
+        response = get_sql_agent().invoke({"messages": [{"role": "user", "content": query}]},
+                                          config={"callbacks": [metrics_callback]})
+    finally:
+        executed_queries.reset(token)
+    if SQL_PLAN_CACHE_ENABLED and not isinstance(response, list):
+        tools_used = {message.name for message in response["messages"] if isinstance(message, ToolMessage)}
+        _remember_plan(query, version, executed, tools_used)
+
     if isinstance(response, list):
         return response[0].content if response else "No response"
     return response["messages"][-1].content
@@ -0,0 +1,203 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+
+SQL_PLAN_CACHE_ENABLED = os.getenv("SQL_PLAN_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+SQL_PLAN_CACHE_SIZE = int(os.getenv("SQL_PLAN_CACHE_SIZE", 256))
+SQL_PLAN_CACHE_TTL_SECONDS = float(os.getenv("SQL_PLAN_CACHE_TTL_SECONDS", 3600))
+
+# words whose following word is treated as a value ("notes tagged work" -> "notes tagged {0}")
+SLOT_KEYWORDS = ("tagged", "tag", "titled", "title", "called", "named", "mentioning", "containing")
+
+# (sql, result) of statements the SQL agent ran successfully during the current call
+executed_queries = ContextVar("executed_queries", default=None)
+
+_QUOTED = r"'([^']+)'|\"([^\"]+)\"|‘([^’]+)’|“([^”]+)”"
+_SLOT = r"\b(?:" + "|".join(SLOT_KEYWORDS) + r")\s+([\w-]+)"
+_NUMBER = r"\b(\d+)\b"
+_QUESTION_VALUES = re.compile(f"{_QUOTED}|{_SLOT}|{_NUMBER}", re.IGNORECASE)
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_READ_ONLY = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+# questions asking for a change; the agent may answer them with a SELECT first, which must not be replayed
+_WRITE_INTENT = re.compile(
+    r"\b(add|create|insert|save|delete|remove|drop|erase|purge|update|change|edit|modify|rename|replace|"
+    r"archive|unarchive|untag|move|mark)\b",
+    re.IGNORECASE,
+)
+# dates the agent computed itself ("yesterday" -> '2026-10-16') are only right on the day they were stored
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def is_read_question(question: str) -> bool:
+    return not _WRITE_INTENT.search(question)
+
+
+def normalize_question(question: str):
+    """
+    Split a question into a template and its literal values:
+    'notes tagged "work" from the last 5 days' -> ('notes tagged {0} from the last {1} days', ['work', '5'])
+    """
+    values = []
+
+    def replace(match):
+        value = next(group for group in match.groups() if group is not None)
+        values.append(value)
+        placeholder = "{%d}" % (len(values) - 1)
+        # keep the slot keyword, only the value becomes a parameter
+        return match.group(0).replace(value, placeholder) if match.group(5) else placeholder
+
+    template = _QUESTION_VALUES.sub(replace, question.strip())
+    template = re.sub(r"\s+", " ", template).strip(" ?.!").lower()
+    return template, values
+
+
+def parameterize_sql(sql: str, values: list):
+    """
+    Replace the question's values in the agent's SQL with bind parameters.
+    Returns (sql_template, specs) where specs[i] is the literal pattern for value i
+    (e.g. '%{}%' for a LIKE), or None if a value can not be located unambiguously.
+    """
+    if not _READ_ONLY.match(sql) or ";" in sql.strip().rstrip(";"):
+        return None
+    if not values:
+        return sql, []
+    specs = {}
+    pieces = []
+    last = 0
+    for match in _SQL_LITERAL.finditer(sql):
+        literal = match.group(0)[1:-1].replace("''", "'")
+        pieces.append(sql[last:match.start()])
+        for i, value in enumerate(values):
+            position = literal.lower().find(value.lower())
+            if position >= 0 and not value.isdigit():
+                pattern = literal[:position] + "{}" + literal[position + len(value):]
+                if specs.setdefault(i, pattern) != pattern:
+                    return None
+                pieces.append(f":p{i}")
+                break
+        else:
+            pieces.append(match.group(0))
+        last = match.end()
+    pieces.append(sql[last:])
+
+    # numbers are bound where they appear outside string literals (LIMIT 5, id = 12), but only
+    # when that place is unambiguous: one occurrence, not a flag (is_archived = 1), and not
+    # also inside a literal that stays constant (datetime('now', '-1 day'))
+    for i, value in enumerate(values):
+        if not value.isdigit():
+            continue
+        number = re.compile(rf"(?<![\w:]){value}\b")
+        code = "".join(pieces[0::2])
+        literals = [piece for piece in pieces[1::2] if piece.startswith("'")]
+        if (len(number.findall(code)) > 1
+                or re.search(rf"\b(?:is|has)_\w+\s*(?:=|!=|<>)\s*{value}\b", code, re.IGNORECASE)
+                or any(re.search(rf"(?<!\d){value}(?!\d)", literal) for literal in literals)):
+            return None
+        for j in range(0, len(pieces), 2):
+            pieces[j], count = number.subn(f":p{i}", pieces[j])
+            if count:
+                specs[i] = "{}"
+
+    if len(specs) != len(values):
+        return None
+    return "".join(pieces), [specs[i] for i in range(len(values))]
+
+
+def bind_parameters(specs: list, values: list) -> dict:
+    params = {}
+    for i, (spec, value) in enumerate(zip(specs, values)):
+        params[f"p{i}"] = int(value) if spec == "{}" and value.isdigit() else spec.format(value)
+    return params
+
+
+class SQLPlanCache:
+    """
+    LRU + TTL cache of question templates -> validated parameterized SELECTs.
+    Entries remember the schema version they were produced under and are dropped when it changes.
+    """
+
+    def __init__(self, max_size: int = SQL_PLAN_CACHE_SIZE, ttl_seconds: float = SQL_PLAN_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, question: str, schema_version) -> Optional[tuple]:
+        """(sql, params) ready to execute, or None on a miss"""
+        template, values = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(template)
+            if entry is not None and entry["schema_version"] != schema_version:
+                del self._entries[template]
+                self.invalidations += 1
+                entry = None
+            if entry is not None and time.monotonic() - entry["stored_at"] > self.ttl_seconds:
+                del self._entries[template]
+                self.evictions += 1
+                entry = None
+            if entry is None or len(entry["specs"]) != len(values):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(template)
+            self.hits += 1
+            return entry["sql"], bind_parameters(entry["specs"], values)
+
+    def store(self, question: str, schema_version, sql: str, validate) -> bool:
+        """
+        Cache the agent's SQL for this question's template. Questions asking for a change and
+        SQL with dates that are not in the question are refused. `validate(sql, params)` must
+        return True when the parameterized statement reproduces the agent's result.
+        """
+        if not is_read_question(question):
+            return False
+        template, values = normalize_question(question)
+        parameterized = parameterize_sql(sql, values)
+        if parameterized is None:
+            return False
+        sql_template, specs = parameterized
+        if any(date not in question for date in _DATE.findall(sql_template)):
+            return False
+        if not validate(sql_template, bind_parameters(specs, values)):
+            return False
+        with self._lock:
+            self._entries[template] = {
+                "sql": sql_template,
+                "specs": specs,
+                "schema_version": schema_version,
+                "stored_at": time.monotonic(),
+            }
+            self._entries.move_to_end(template)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self.stores += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+sql_plan_cache = SQLPlanCache()
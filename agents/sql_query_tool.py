@@ -0,0 +1,13 @@
+from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
+from .sql_plan_cache import executed_queries
+
+
+class RecordingQuerySQLDatabaseTool(QuerySQLDatabaseTool):
+    """Query tool that remembers successful statements so they can feed the plan cache"""
+
+    def _run(self, query: str, run_manager=None):
+        result = super()._run(query, run_manager=run_manager)
+        executed = executed_queries.get()
+        if executed is not None and not str(result).startswith("Error"):
+            executed.append((query, result))
+        return result
@@ -1,16 +1,10 @@
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from functools import lru_cache
 from dotenv import load_dotenv
+from metrics import metrics_callback, traced
 
 load_dotenv()
 
-llm = ChatGroq(
-    model="openai/gpt-oss-120b",
-    temperature=0.0,
-)
-
-prompt = ChatPromptTemplate.from_template("""
+SUMMARY_PROMPT = """
 You are an expert at summarizing conversations clearly and concisely.
 
 Follow these rules strictly:
@@ -27,16 +21,36 @@ Conversation:
 {conversation}
 
 Summary:
-""")
+"""
+
+
+@lru_cache(maxsize=1)
+def get_llm():
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model="openai/gpt-oss-120b",
+        temperature=0.0,
+        callbacks=[metrics_callback],
+    )
+
 
+@lru_cache(maxsize=1)
+def get_summarization_chain():
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
 
+    return ChatPromptTemplate.from_template(SUMMARY_PROMPT) | get_llm() | StrOutputParser()
 
-sum_chain = prompt | llm | StrOutputParser()
 
-def call_summarization_agent(conversation: str | list) -> str:
+@traced("summarization")
+def call_summarization_agent(conversation: str | list, previous_summary: str | None = None) -> str:
 
     if isinstance(conversation, list):
         lines = []
+        if previous_summary:
+            # rolling summary: fold the new messages into the existing one
+            lines.append(f"summary of earlier conversation: {previous_summary}")
         for msg in conversation:
             lines.append(f"{msg.role}: {msg.content}")
         conversation_text = "\n".join(lines)
@@ -47,7 +61,7 @@ def call_summarization_agent(conversation: str | list) -> str:
         return "[No conversation provided]"
 
     # Invoke the agent
-    result = sum_chain.invoke({
+    result = get_summarization_chain().invoke({
         "conversation": conversation_text,
     })
     return result
@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from databases.session_database import (
+    SessionLocal,
+    SessionManager,
+    SUMMARY_TRIGGER_MESSAGES,
+    SUMMARY_IDLE_MIN_MESSAGES,
+)
+
+# number of background threads producing summaries
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", 1))
+# a session without new messages for this long gets compacted
+SUMMARY_IDLE_SECONDS = float(os.getenv("SUMMARY_IDLE_SECONDS", 300))
+# how often idle sessions are looked up
+SUMMARY_SWEEP_SECONDS = float(os.getenv("SUMMARY_SWEEP_SECONDS", 60))
+
+
+class SummarizationWorker:
+    """
+    Compacts sessions off the request path.
+    Jobs are deduplicated per session: a session already waiting in the queue
+    is not queued again, so a burst of turns produces a single summary.
+    A session is never summarized by two threads at once: a job submitted while
+    its session is being summarized is queued when that run finishes.
+    """
+
+    def __init__(self, workers: int = SUMMARY_WORKERS,
+                 idle_seconds: float = SUMMARY_IDLE_SECONDS,
+                 sweep_seconds: float = SUMMARY_SWEEP_SECONDS):
+        self.workers = workers
+        self.idle_seconds = idle_seconds
+        self.sweep_seconds = sweep_seconds
+        self._queue = queue.Queue()
+        # session_id -> (enqueued_at, min_messages) for jobs waiting in the queue
+        self._pending = {}
+        # sessions being summarized -> min_messages of a follow-up job submitted meanwhile (or None)
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.processed = 0
+        self.summarized = 0
+        self.failed = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def submit(self, session_id: str, min_messages: int = SUMMARY_TRIGGER_MESSAGES) -> bool:
+        """Queue a session for compaction, returns False if it is already queued"""
+        with self._lock:
+            if session_id in self._running:
+                follow_up = self._running[session_id]
+                self._running[session_id] = min_messages if follow_up is None else min(follow_up, min_messages)
+                return False
+            if session_id in self._pending:
+                enqueued_at, queued_min = self._pending[session_id]
+                self._pending[session_id] = (enqueued_at, min(queued_min, min_messages))
+                return False
+            self._pending[session_id] = (time.monotonic(), min_messages)
+        self._queue.put(session_id)
+        return True
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"summarizer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.idle_seconds > 0:
+            thread = threading.Thread(target=self._sweep, name="summarizer-sweep", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                session_id = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._lock:
+                enqueued_at, min_messages = self._pending.pop(session_id)
+                self._running[session_id] = None
+            lag = time.monotonic() - enqueued_at
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+            db = SessionLocal()
+            try:
+                if SessionManager(db).summarize_if_needed(session_id, min_messages=min_messages):
+                    self.summarized += 1
+            except Exception:
+                db.rollback()
+                self.failed += 1
+            finally:
+                db.close()
+                self.processed += 1
+                with self._lock:
+                    follow_up = self._running.pop(session_id)
+                if follow_up is not None:
+                    self.submit(session_id, min_messages=follow_up)
+                self._queue.task_done()
+
+    def _sweep(self):
+        while not self._stop.wait(self.sweep_seconds):
+            db = SessionLocal()
+            try:
+                idle_before = datetime.utcnow() - timedelta(seconds=self.idle_seconds)
+                for session_id in SessionManager(db).find_idle_sessions(idle_before):
+                    self.submit(session_id, min_messages=SUMMARY_IDLE_MIN_MESSAGES)
+            except Exception:
+                db.rollback()
+            finally:
+                db.close()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            oldest = min((enqueued_at for enqueued_at, _ in self._pending.values()), default=None)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "oldest_job_age_seconds": 0.0 if oldest is None else time.monotonic() - oldest,
+            "last_lag_seconds": self.last_lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "processed": self.processed,
+            "summarized": self.summarized,
+            "failed": self.failed,
+            "workers": self.workers,
+        }
+
+
+summarization_worker = SummarizationWorker()
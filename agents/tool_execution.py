@@ -0,0 +1,100 @@
+"""
+Concurrent, time-bounded tool calls for the main agent.
+
+create_agent already fans the tool calls of one model step out as parallel graph tasks and
+returns their ToolMessages in call order. This module decides where they run and how long
+they may take: sync tools go to a dedicated thread pool (instead of the event loop's default
+executor shared with the rest of the API), async tools stay on the loop, and every call gets
+a per-tool timeout after which the model receives an error message instead of a result.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextvars import copy_context
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import StructuredTool
+from metrics import tool_timeouts
+
+# threads running sync tools (database_agent, send_email, ...) across all agent turns
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", 16))
+# limit for a single tool call, in seconds
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", 60))
+# per-tool overrides, "name=seconds" separated by commas
+TOOL_TIMEOUTS = os.getenv("TOOL_TIMEOUTS", "database_agent=90,tavily_search=20,get_current_time=5")
+
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+
+
+def parse_timeouts(spec: str) -> dict:
+    timeouts = {}
+    for item in spec.split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() and seconds.strip():
+            timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+async def run_in_tool_pool(func, *args, **kwargs):
+    """Run a blocking call on the tool pool, with the caller's context variables (request trace, ...)"""
+    loop = asyncio.get_running_loop()
+    context = copy_context()
+    return await loop.run_in_executor(tool_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def with_tool_pool(tool):
+    """
+    Give a sync-only function tool an async implementation that runs on the tool pool.
+    Tools with their own coroutine, and BaseTool subclasses, are returned unchanged.
+    """
+    if not isinstance(tool, StructuredTool) or tool.coroutine is not None or tool.func is None:
+        return tool
+
+    @functools.wraps(tool.func)
+    async def coroutine(*args, **kwargs):
+        return await run_in_tool_pool(tool.func, *args, **kwargs)
+
+    return tool.model_copy(update={"coroutine": coroutine})
+
+
+class ToolTimeoutMiddleware(AgentMiddleware):
+    """
+    Bounds every tool call by its timeout. A call that runs over is answered with an error
+    ToolMessage so the agent can go on with the other results; a sync tool's thread can not
+    be interrupted and finishes in the background, its result is dropped.
+    """
+
+    def __init__(self, default_seconds: float = TOOL_TIMEOUT_SECONDS, per_tool: dict = None):
+        super().__init__()
+        self.default_seconds = default_seconds
+        self.per_tool = parse_timeouts(TOOL_TIMEOUTS) if per_tool is None else dict(per_tool)
+
+    def timeout_for(self, name: str) -> float:
+        return self.per_tool.get(name, self.default_seconds)
+
+    def _timed_out(self, request, seconds: float) -> ToolMessage:
+        name = request.tool_call["name"]
+        tool_timeouts.inc(tool=name)
+        return ToolMessage(
+            content=f"Error: {name} did not finish within {seconds:g} seconds. "
+                    f"Answer with the other results or tell the user it timed out.",
+            name=name,
+            tool_call_id=request.tool_call["id"],
+            status="error",
+        )
+
+    def wrap_tool_call(self, request, handler):
+        seconds = self.timeout_for(request.tool_call["name"])
+        future = tool_executor.submit(copy_context().run, handler, request)
+        try:
+            return future.result(timeout=seconds)
+        except FutureTimeoutError:
+            return self._timed_out(request, seconds)
+
+    async def awrap_tool_call(self, request, handler):
+        seconds = self.timeout_for(request.tool_call["name"])
+        try:
+            return await asyncio.wait_for(handler(request), seconds)
+        except asyncio.TimeoutError:
+            return self._timed_out(request, seconds)
@@ -1,19 +1,23 @@
 import datetime
-from langchain.tools import tool
+from functools import lru_cache
+from langchain_core.tools import tool
 import pytz
 from .sql_agent import call_sql_agent
-import smtplib
-from email.message import EmailMessage
+from databases.email_outbox import EmailOutbox, OutboxSessionLocal
+from .notes_tools import get_notes_tools
+from .email_sender import email_sender
+from .web_search import CachedSearchTool, WEB_SEARCH_CACHE_ENABLED, WEB_SEARCH_PROVIDER, local_search, web_search_cache
 from dotenv import load_dotenv
-from langchain_tavily import TavilySearch
-import os
 
 load_dotenv()
 
 @tool("database_agent",
     description=(
-        "Use this tool when the user asks questions, wants to search, filter, "
-        "add, update, archive or manage personal notes and tags in the database. "
+        "Free-form fallback for personal notes and tags. Prefer the dedicated note tools "
+        "(add_note, update_note, archive_note, list_recent_notes, list_notes_by_tag, search_notes, "
+        "semantic_search_notes) "
+        "and use this tool only for requests they cannot express, such as counts, date filters, "
+        "bulk changes or tag management. "
         "The database contains only notes (with title, content, timestamps, archive status) "
         "and tags (many-to-many). "
         "Pass the full user question/query directly to this tool. "
@@ -26,29 +30,41 @@ def call_database_agent(query: str) -> str:
     return result
 
 
-search_tool = TavilySearch(
-    max_results=5,
-    topic="general",
-    include_answer=False,
-    include_raw_content=False,
-    # include_images=False,
-    # include_image_descriptions=False,
-    # search_depth="basic",
-    # time_range="day",
-    # include_domains=None,
-    # exclude_domains=None
-)
+@lru_cache(maxsize=1)
+def get_search_provider():
+    if WEB_SEARCH_PROVIDER == "local":
+        return local_search
+
+    from langchain_tavily import TavilySearch
+
+    return TavilySearch(
+        max_results=5,
+        topic="general",
+        include_answer=False,
+        include_raw_content=False,
+        # include_images=False,
+        # include_image_descriptions=False,
+        # search_depth="basic",
+        # time_range="day",
+        # include_domains=None,
+        # exclude_domains=None
+    )
 
 
-MAIL_ACCOUNT = os.getenv("MAIL_ACCOUNT")
-MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+@lru_cache(maxsize=1)
+def get_search_tool():
+    provider = get_search_provider()
+    if not WEB_SEARCH_CACHE_ENABLED:
+        return provider
+    return CachedSearchTool(provider, web_search_cache)
+
 
 @tool("send_email",
     description=(
         "Use this tool to send an email. "
-        "You need to provide the recipient's email address, subject, and body content."
+        "You need to provide the recipient's email address, subject, and body content. "
+        "The email is queued and delivered in the background; the result contains its outbox id "
+        "for email_status."
     )
 )
 def send_email(to: str, subject: str, body: str) -> str:
@@ -58,25 +74,42 @@ def send_email(to: str, subject: str, body: str) -> str:
         subject: Subject of the email.
         body: Body content of the email.
     Returns:
-        Text indicating success or failure.
+        Text with the outbox id, or the reason the email could not be queued.
     """
 
     try:
-        msg = EmailMessage()
-        msg["From"] = MAIL_ACCOUNT
-        msg["To"] = to
-        msg["Subject"] = subject
-        msg.set_content(body)
-
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(MAIL_ACCOUNT, MAIL_PASSWORD)
-            server.send_message(msg)
-
-        return "Email sent successfully."
+        email = email_sender.submit(to, subject, body)
+        return f"Email to {to} queued for delivery (outbox id {email.id})."
     except Exception as e:
-        
-        return f"Failed to send email: {e}"
+
+        return f"Failed to queue email: {e}"
+
+
+@tool("email_status")
+def email_status(email_id: int) -> dict:
+    """
+    Delivery status of an email queued with send_email.
+    Args:
+        email_id: Outbox id returned by send_email.
+    Returns:
+        status (queued, sending, sent or failed), attempts and the last error.
+    """
+    db = OutboxSessionLocal()
+    try:
+        email = EmailOutbox(db).get(email_id)
+    finally:
+        db.close()
+    if email is None:
+        return {"error": f"No queued email with id {email_id}"}
+    return {
+        "id": email.id,
+        "to": email.recipient,
+        "subject": email.subject,
+        "status": email.status,
+        "attempts": email.attempts,
+        "last_error": email.last_error,
+        "sent_at": email.sent_at.isoformat() if email.sent_at else None,
+    }
 
 @tool
 def get_current_time(
@@ -103,4 +136,8 @@ Returns:
 
 
 def get_tools():
-    return [call_database_agent, send_email, get_current_time, search_tool]
\ No newline at end of file
+    from .tool_execution import with_tool_pool
+
+    tools = [call_database_agent, *get_notes_tools(), send_email, email_status, get_current_time, get_search_tool()]
+    # sync tools run on the tool pool when the agent is invoked asynchronously
+    return [with_tool_pool(tool) for tool in tools]
\ No newline at end of file
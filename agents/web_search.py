@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from langchain_core.tools import BaseTool, tool
+
+WEB_SEARCH_CACHE_ENABLED = os.getenv("WEB_SEARCH_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+# how long a search result is reused; news moves, so keep this in minutes
+WEB_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", 900))
+# results kept in memory, least recently used are dropped first
+WEB_SEARCH_CACHE_SIZE = int(os.getenv("WEB_SEARCH_CACHE_SIZE", 512))
+# SQLite file that keeps results across restarts and shares them between workers (empty: memory only)
+WEB_SEARCH_CACHE_PATH = os.getenv("WEB_SEARCH_CACHE_PATH", "")
+# "tavily" or "local" (deterministic offline results, for tests and development)
+WEB_SEARCH_PROVIDER = os.getenv("WEB_SEARCH_PROVIDER", "tavily").lower()
+
+
+def normalize_query(query: str) -> str:
+    """Case, spacing and trailing punctuation do not change what a search returns"""
+    return re.sub(r"\s+", " ", query or "").strip().strip("?.!").strip().lower()
+
+
+def cache_key(provider: str, arguments: dict) -> str:
+    params = {name: value for name, value in arguments.items() if name != "query" and value is not None}
+    return json.dumps([provider, normalize_query(arguments.get("query", "")), params], sort_keys=True, default=str)
+
+
+def _cacheable(result) -> bool:
+    # TavilySearch reports transport failures as {"error": ...} instead of raising; an empty
+    # result list is often a provider hiccup, so the next search should try again
+    if not result:
+        return False
+    if isinstance(result, dict):
+        return "error" not in result and bool(result.get("results", True))
+    return True
+
+
+class SQLiteSearchStore:
+    """Search results on disk, so a restart or another worker process starts warm"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS web_search_cache "
+                "(key_hash TEXT PRIMARY KEY, key TEXT NOT NULL, result TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str, max_age: float):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, result, stored_at FROM web_search_cache WHERE key_hash = ?", (self._hash(key),)
+            ).fetchone()
+        if row is None or row[0] != key or time.time() - row[2] > max_age:
+            return None
+        return json.loads(row[1]), row[2]
+
+    def put(self, key: str, result, stored_at: float):
+        try:
+            payload = json.dumps(result)
+        except (TypeError, ValueError):
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO web_search_cache (key_hash, key, result, stored_at) VALUES (?, ?, ?, ?)",
+                (self._hash(key), key, payload, stored_at),
+            )
+
+    def prune(self, max_age: float) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM web_search_cache WHERE stored_at < ?", (time.time() - max_age,)
+            ).rowcount
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM web_search_cache")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WebSearchCache:
+    """
+    LRU + TTL cache of search results keyed by provider, normalized query and parameters,
+    with an optional disk store behind it. Concurrent misses on the same key share one
+    upstream call (single-flight); failures are handed to every waiter and never cached.
+    """
+
+    def __init__(self, max_size: int = WEB_SEARCH_CACHE_SIZE, ttl_seconds: float = WEB_SEARCH_CACHE_TTL_SECONDS,
+                 store: SQLiteSearchStore = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        if store is not None:
+            store.prune(ttl_seconds)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.evictions = 0
+
+    def _get_fresh(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, stored_at = entry
+        if time.time() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: str, result, stored_at: float):
+        self._entries[key] = (result, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_fetch(self, key: str, fetch):
+        """Cached result for `key`, or the result of `fetch()` shared with concurrent callers"""
+        with self._lock:
+            entry = self._get_fresh(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            stored = self.store.get(key, self.ttl_seconds) if self.store is not None else None
+            if stored is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put(key, *stored)
+                flight.result = stored[0]
+                return flight.result
+
+            with self._lock:
+                self.misses += 1
+                self.upstream_calls += 1
+            try:
+                result = fetch()
+            except Exception as e:
+                with self._lock:
+                    self.upstream_errors += 1
+                flight.error = e
+                raise
+            flight.result = result
+            if _cacheable(result):
+                stored_at = time.time()
+                with self._lock:
+                    self._put(key, result, stored_at)
+                if self.store is not None:
+                    self.store.put(key, result, stored_at)
+            elif isinstance(result, dict) and "error" in result:
+                with self._lock:
+                    self.upstream_errors += 1
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self.store is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "evictions": self.evictions,
+            "in_flight": len(self._inflight),
+        }
+
+
+class CachedSearchTool(BaseTool):
+    """A search tool answered from a WebSearchCache; same name, description and arguments as `provider`"""
+
+    provider: BaseTool
+    cache: Any
+
+    def __init__(self, provider: BaseTool, cache: WebSearchCache, **kwargs):
+        super().__init__(
+            name=provider.name,
+            description=provider.description,
+            args_schema=provider.args_schema,
+            handle_tool_error=provider.handle_tool_error,
+            provider=provider,
+            cache=cache,
+            **kwargs,
+        )
+
+    def _run(self, run_manager=None, **kwargs):
+        return self.cache.get_or_fetch(cache_key(self.provider.name, kwargs), lambda: self.provider.invoke(kwargs))
+
+    async def _arun(self, run_manager=None, **kwargs):
+        # single-flight waits on threads, so async calls go through the tool pool as well
+        from .tool_execution import run_in_tool_pool
+
+        return await run_in_tool_pool(self._run, **kwargs)
+
+
+@tool("tavily_search")
+def local_search(query: str) -> dict:
+    """Search the web for current information."""
+    seed = hashlib.sha1(normalize_query(query).encode()).hexdigest()[:8]
+    return {
+        "query": query,
+        "results": [
+            {"title": f"Result {i} for {query}", "url": f"https://example.com/{seed}/{i}",
+             "content": f"Deterministic snippet {i} about {query}."}
+            for i in range(5)
+        ],
+    }
+
+
+web_search_cache = WebSearchCache(store=SQLiteSearchStore(WEB_SEARCH_CACHE_PATH) if WEB_SEARCH_CACHE_PATH else None)
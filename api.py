@@ -1,20 +1,63 @@
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import json
+import os
+import time
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session as DBSession
-from databases.session_database import SessionManager, get_session_db, init_session_db
+from databases.session_database import SESSION_GROUP_COMMIT, group_commit_writer, init_session_db
+from databases.async_session_database import AsyncSessionManager, AsyncSessionLocal, get_async_session_db
+from databases.session_locks import SessionBusyError, session_turn
 from schemas import (
     CreateSessionRequest,
     SessionResponse,
-    SessionSchema,
+    SessionDetailSchema,
+    SessionListResponse,
     ChatRequest,
     ChatResponse,
+    NoteSchema,
+    NoteSearchResult,
+    CreateNoteRequest,
+    UpdateNoteRequest,
+    OutboxEmailSchema,
 )
-from databases.notes_database import init_notes_db
+from databases.notes_database import NotesManager, get_notes_db, init_notes_db
+from databases.email_outbox import EmailOutbox, get_outbox_db, init_outbox_db
 
-from agents.main_agent import call_main_agent
+from agents.main_agent import MODEL_NAME, acall_main_agent, astream_main_agent, warmup
+from agents.context import get_context_budget
+from agents.summarization_worker import summarization_worker
+from agents.email_sender import email_sender
+from agents.sql_plan_cache import sql_plan_cache
+from agents.web_search import web_search_cache
+from databases.notes_database import notes_result_cache
+from metrics import (
+    METRICS_TIMING_HEADER,
+    http_request_duration,
+    registry,
+    request_trace,
+    server_timing,
+)
+
+# max number of agent turns running at once, extra requests wait for a free slot
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", 8))
+# per-request budget (session lock + queueing + agent run); the agent task is cancelled when exceeded
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", 120))
+
+# build LLM clients and agents in the background at startup; /ready answers 503 until done
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "1").lower() in ("1", "true", "yes")
+
+agent_slots = asyncio.Semaphore(AGENT_MAX_CONCURRENCY)
+# tokens of history + summary sent to the main agent
+CONTEXT_BUDGET = get_context_budget(MODEL_NAME)
 
 app = FastAPI(title="Agent API", version="1.0.0")
 
+# startup progress reported by /ready
+readiness = {"databases": False, "agents": not AGENT_WARMUP, "error": None}
+
 # Allow browser apps to call the API
 app.add_middleware(
     CORSMiddleware,
@@ -25,21 +68,131 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    trace = []
+    token = request_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_trace.reset(token)
+    route = request.scope.get("route")
+    http_request_duration.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=response.status_code,
+    )
+    if METRICS_TIMING_HEADER and trace and not isinstance(response, StreamingResponse):
+        response.headers["Server-Timing"] = server_timing(trace)
+    return response
+
+
+def _runtime_metrics() -> dict:
+    worker = summarization_worker.metrics()
+    plan_cache = sql_plan_cache.stats()
+    result_cache = notes_result_cache.stats()
+    search_cache = web_search_cache.stats()
+    email = email_sender.metrics()
+    return {
+        "agent_slots_available": ("gauge", "Free agent concurrency slots", agent_slots._value),
+        "summarization_queue_depth": ("gauge", "Sessions waiting for summarization", worker["queue_depth"]),
+        "summarization_lag_seconds": ("gauge", "Queue lag of the last summarization job", worker["last_lag_seconds"]),
+        "sql_plan_cache_hits_total": ("counter", "SQL plan cache hits", plan_cache["hits"]),
+        "sql_plan_cache_misses_total": ("counter", "SQL plan cache misses", plan_cache["misses"]),
+        "notes_result_cache_hits_total": ("counter", "Notes result cache hits", result_cache["hits"]),
+        "notes_result_cache_misses_total": ("counter", "Notes result cache misses", result_cache["misses"]),
+        "notes_result_cache_bytes": ("gauge", "Bytes held by the notes result cache", result_cache["bytes"]),
+        "web_search_cache_hits_total": ("counter", "Web searches answered from the cache",
+                                        search_cache["hits"] + search_cache["disk_hits"]),
+        "web_search_upstream_calls_total": ("counter", "Web searches sent to the provider", search_cache["upstream_calls"]),
+        "web_search_coalesced_total": ("counter", "Web searches that waited for an identical one in flight",
+                                       search_cache["coalesced"]),
+        "email_outbox_queued": ("gauge", "Emails waiting for delivery", email["outbox"]["queued"]),
+        "email_outbox_failed": ("gauge", "Emails that could not be delivered", email["outbox"]["failed"]),
+        "email_sent_total": ("counter", "Emails delivered by this process", email["sent"]),
+        "email_retries_total": ("counter", "Failed delivery attempts that will be retried", email["retried"]),
+    }
+
+
+registry.register_collector(_runtime_metrics)
+
+
+async def run_agent(query: str, chat_history: list) -> str:
+    async with agent_slots:
+        return await acall_main_agent(query, chat_history)
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def save_turn(session_id: str, query: str, response_text: str):
+    # own db session: the request-scoped one is already closed once a stream is running
+    async with AsyncSessionLocal() as db:
+        await AsyncSessionManager(db).save_turn(session_id, query, response_text)
+
+
+async def session_exists(session_id: str) -> bool:
+    # short-lived db session: chat endpoints must not hold a pooled connection while the agent runs
+    async with AsyncSessionLocal() as db:
+        return await AsyncSessionManager(db).get_session(session_id) is not None
+
+
+async def load_history(session_id: str, enable_history: bool) -> list:
+    if not enable_history:
+        return []
+    async with AsyncSessionLocal() as db:
+        return await AsyncSessionManager(db).get_chat_history(session_id, CONTEXT_BUDGET)
+
+
+async def persist_turn(session_id: str, query: str, response_text: str):
+    if SESSION_GROUP_COMMIT:
+        await asyncio.wrap_future(group_commit_writer.submit(session_id, query, response_text))
+    else:
+        await save_turn(session_id, query, response_text)
+    # compaction happens after the response, the next turn picks up the new summary
+    summarization_worker.submit(session_id)
+
+
+async def warmup_agents():
+    try:
+        await asyncio.to_thread(warmup)
+        readiness["agents"] = True
+    except Exception as e:
+        readiness["error"] = f"warmup failed: {e}"
+
 
 @app.on_event("startup")
 async def startup_event():
     init_session_db()
     init_notes_db()
+    init_outbox_db()
+    readiness["databases"] = True
+    summarization_worker.start()
+    email_sender.start()
+    if SESSION_GROUP_COMMIT:
+        group_commit_writer.start()
+    if AGENT_WARMUP:
+        app.state.warmup_task = asyncio.create_task(warmup_agents())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    summarization_worker.stop()
+    group_commit_writer.stop()
+    email_sender.stop()
 
 
 @app.post("/sessions/create", response_model=SessionResponse)
 async def create_session(
     request: CreateSessionRequest | None = None,
-    db: DBSession = Depends(get_session_db)
+    db: AsyncSession = Depends(get_async_session_db)
 ):
     """Create a new conversation session"""
-    manager = SessionManager(db)
-    session = manager.create_session(session_name=request.session_name if request else None)
+    manager = AsyncSessionManager(db)
+    session = await manager.create_session(session_name=request.session_name if request else None)
     return SessionResponse(
         session_id=session.id,
         session_name=session.session_name,
@@ -47,28 +200,53 @@ async def create_session(
     )
 
 
-@app.get("/sessions/{session_id}", response_model=SessionSchema)
-async def get_session(session_id: str, db: DBSession = Depends(get_session_db)):
-    """Get session details including chat history"""
-    manager = SessionManager(db)
-    session = manager.get_session(session_id)
+@app.get("/sessions/{session_id}", response_model=SessionDetailSchema)
+async def get_session(
+    session_id: str,
+    before: int | None = None,
+    after: int | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_session_db)
+):
+    """Get session details with one page of chat history (newest page by default)"""
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    manager = AsyncSessionManager(db)
+    session = await manager.get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return session
+    messages, has_more = await manager.get_messages_page(session_id, before=before, after=after, limit=limit)
+    return SessionDetailSchema(
+        id=session.id,
+        session_name=session.session_name,
+        created_at=session.created_at,
+        updated_at=session.updated_at,
+        messages=messages,
+        has_more=has_more,
+    )
 
 
-@app.get("/sessions", response_model=list[SessionSchema])
-async def list_sessions(db: DBSession = Depends(get_session_db)):
-    """List all sessions"""
-    manager = SessionManager(db)
-    return manager.list_sessions()
+@app.get("/sessions", response_model=SessionListResponse)
+async def list_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    name_prefix: str | None = None,
+    db: AsyncSession = Depends(get_async_session_db)
+):
+    """List sessions by last activity, with message counts and a preview of the last message"""
+    manager = AsyncSessionManager(db)
+    try:
+        sessions, next_cursor = await manager.list_sessions(limit=limit, cursor=cursor, name_prefix=name_prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SessionListResponse(sessions=sessions, next_cursor=next_cursor)
 
 
 @app.delete("/sessions/{session_id}", response_model=SessionResponse)
-async def delete_session(session_id: str, db: DBSession = Depends(get_session_db)):
+async def delete_session(session_id: str, db: AsyncSession = Depends(get_async_session_db)):
     """Delete a session"""
-    manager = SessionManager(db)
-    success = manager.delete_session(session_id)
+    manager = AsyncSessionManager(db)
+    success = await manager.delete_session(session_id)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
     return SessionResponse(
@@ -78,26 +256,216 @@ async def delete_session(session_id: str, db: DBSession = Depends(get_session_db
 
 
 @app.post("/query/chat", response_model=ChatResponse)
-async def chat(
-    request: ChatRequest,
-    db: DBSession = Depends(get_session_db)
-):
+async def chat(request: ChatRequest):
     """Send a message to the agent and get a response"""
-    manager = SessionManager(db)
-    session = manager.get_session(request.session_id)
-    
-    if not session:
+    if not await session_exists(request.session_id):
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    chat_history = ([] if not request.enable_history else manager.get_chat_history(request.session_id))
-    response_text = call_main_agent(request.query, chat_history[-10:])
-    manager.save_message(request.session_id, "human", request.query)
-    manager.save_message(request.session_id, "ai", response_text)
-    
+
+    # one budget for waiting on the session and running the agent
+    deadline = asyncio.get_running_loop().time() + AGENT_TIMEOUT_SECONDS
+    try:
+        async with session_turn(request.session_id, wait_seconds=AGENT_TIMEOUT_SECONDS):
+            # read under the turn lock, so the previous turn of this session is already saved
+            chat_history = await load_history(request.session_id, request.enable_history)
+            try:
+                async with asyncio.timeout_at(deadline):
+                    response_text = await run_agent(request.query, chat_history)
+            except TimeoutError:
+                raise HTTPException(status_code=504, detail="Agent timed out")
+
+            await persist_turn(request.session_id, request.query, response_text)
+    except SessionBusyError:
+        raise HTTPException(status_code=409, detail="Another turn of this session is still running")
+
     return ChatResponse(response=response_text)
-       
 
-        
+
+@app.post("/query/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Send a message to the agent and stream the answer as server-sent events"""
+    if not await session_exists(request.session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def event_stream():
+        response_text = None
+        # one budget for waiting on the session and running the agent
+        deadline = asyncio.get_running_loop().time() + AGENT_TIMEOUT_SECONDS
+        try:
+            async with session_turn(request.session_id, wait_seconds=AGENT_TIMEOUT_SECONDS):
+                chat_history = await load_history(request.session_id, request.enable_history)
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        async with agent_slots:
+                            async for event in astream_main_agent(request.query, chat_history):
+                                if event["type"] == "final":
+                                    response_text = event["content"]
+                                else:
+                                    yield sse_event(event.pop("type"), event)
+                except TimeoutError:
+                    yield sse_event("error", {"detail": "Agent timed out"})
+                    return
+                except Exception as e:
+                    yield sse_event("error", {"detail": str(e)})
+                    return
+
+                await persist_turn(request.session_id, request.query, response_text)
+        except SessionBusyError:
+            yield sse_event("error", {"detail": "Another turn of this session is still running"})
+            return
+
+        done = {"response": response_text}
+        trace = request_trace.get()
+        if METRICS_TIMING_HEADER and trace:
+            done["timings"] = server_timing(trace)
+        yield sse_event("done", done)
+
+    # a client disconnect cancels event_stream, which cancels the agent run with it
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def note_response(note) -> NoteSchema:
+    return NoteSchema(
+        id=note.id,
+        title=note.title,
+        content=note.content,
+        created_at=note.created_at,
+        updated_at=note.updated_at,
+        is_archived=note.is_archived,
+        tags=sorted(tag.name for tag in note.tags),
+    )
+
+
+@app.get("/notes", response_model=list[NoteSchema])
+def list_notes(
+    tag: str | None = None,
+    limit: int = Query(10, ge=1, le=200),
+    include_archived: bool = False,
+    db: DBSession = Depends(get_notes_db)
+):
+    """List the newest notes, optionally only those with a tag"""
+    manager = NotesManager(db)
+    if tag:
+        notes = manager.list_by_tag(tag, limit=limit, include_archived=include_archived)
+    else:
+        notes = manager.list_recent(limit=limit, include_archived=include_archived)
+    return [note_response(note) for note in notes]
+
+
+@app.get("/notes/search", response_model=list[NoteSearchResult])
+def search_notes(
+    q: str,
+    limit: int = Query(10, ge=1, le=200),
+    include_archived: bool = False,
+    db: DBSession = Depends(get_notes_db)
+):
+    """Ranked full-text search over notes"""
+    return NotesManager(db).search(q, limit=limit, include_archived=include_archived)
+
+
+@app.get("/notes/semantic", response_model=list[NoteSearchResult])
+def semantic_search_notes(
+    q: str,
+    limit: int = Query(10, ge=1, le=200),
+    include_archived: bool = False,
+    db: DBSession = Depends(get_notes_db)
+):
+    """Notes closest in meaning to q, from the local vector index"""
+    return NotesManager(db).semantic_search(q, limit=limit, include_archived=include_archived)
+
+
+@app.post("/notes", response_model=NoteSchema)
+def create_note(request: CreateNoteRequest, db: DBSession = Depends(get_notes_db)):
+    """Create a note"""
+    note = NotesManager(db).create_note(request.content, title=request.title, tags=request.tags)
+    return note_response(note)
+
+
+@app.patch("/notes/{note_id}", response_model=NoteSchema)
+def update_note(note_id: int, request: UpdateNoteRequest, db: DBSession = Depends(get_notes_db)):
+    """Update a note's title, content or tags"""
+    note = NotesManager(db).update_note(
+        note_id, title=request.title, content=request.content, tags=request.tags
+    )
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return note_response(note)
+
+
+@app.post("/notes/{note_id}/archive", response_model=NoteSchema)
+def archive_note(note_id: int, archived: bool = True, db: DBSession = Depends(get_notes_db)):
+    """Archive a note (archived=false restores it)"""
+    note = NotesManager(db).archive_note(note_id, archived=archived)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return note_response(note)
+
+
+@app.get("/emails", response_model=list[OutboxEmailSchema])
+def list_emails(
+    status: str = Query(None, description="queued, sending, sent or failed"),
+    limit: int = Query(50, ge=1, le=500),
+    db: DBSession = Depends(get_outbox_db),
+):
+    """Newest emails in the outbox with their delivery status"""
+    return EmailOutbox(db).list_recent(status=status, limit=limit)
+
+
+@app.get("/emails/{email_id}", response_model=OutboxEmailSchema)
+def get_email(email_id: int, db: DBSession = Depends(get_outbox_db)):
+    """Delivery status of one queued email"""
+    email = EmailOutbox(db).get(email_id)
+    if not email:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return email
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the databases are initialized and the agents are built"""
+    body = {"ready": readiness["databases"] and readiness["agents"], **readiness}
+    if not body["ready"]:
+        raise HTTPException(status_code=503, detail=body)
+    return body
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Latency histograms, token counters and runtime gauges in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/summarization")
+def summarization_metrics():
+    """Background summarization queue depth and lag"""
+    return summarization_worker.metrics()
+
+
+@app.get("/metrics/sql-plan-cache")
+def sql_plan_cache_metrics():
+    """Notes SQL plan cache size and hit rate"""
+    return sql_plan_cache.stats()
+
+
+@app.get("/metrics/notes-result-cache")
+def notes_result_cache_metrics():
+    """Notes SELECT result cache size, hit rate and table versions"""
+    return notes_result_cache.stats()
+
+
+@app.get("/metrics/web-search-cache")
+def web_search_cache_metrics():
+    """Web search cache size, hit rate and coalesced upstream calls"""
+    return web_search_cache.stats()
+
+
+@app.get("/metrics/email")
+def email_metrics():
+    """Outbox size by status and this process's delivery counters"""
+    return email_sender.metrics()
 
 
 @app.get("/")
@@ -108,10 +476,26 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "create_session": "POST /sessions/create",
-            "get_session": "GET /sessions/{session_id}",
-            "list_sessions": "GET /sessions",
+            "get_session": "GET /sessions/{session_id}?before=&after=&limit=",
+            "list_sessions": "GET /sessions?limit=&cursor=&name_prefix=",
             "delete_session": "DELETE /sessions/{session_id}",
-            "chat": "POST /query/chat"
+            "chat": "POST /query/chat",
+            "chat_stream": "POST /query/chat/stream",
+            "list_notes": "GET /notes?tag=&limit=",
+            "search_notes": "GET /notes/search?q=",
+            "semantic_search_notes": "GET /notes/semantic?q=",
+            "create_note": "POST /notes",
+            "update_note": "PATCH /notes/{note_id}",
+            "archive_note": "POST /notes/{note_id}/archive",
+            "list_emails": "GET /emails?status=&limit=",
+            "get_email": "GET /emails/{email_id}",
+            "ready": "GET /ready",
+            "metrics": "GET /metrics",
+            "summarization_metrics": "GET /metrics/summarization",
+            "sql_plan_cache_metrics": "GET /metrics/sql-plan-cache",
+            "notes_result_cache_metrics": "GET /metrics/notes-result-cache",
+            "web_search_cache_metrics": "GET /metrics/web-search-cache",
+            "email_metrics": "GET /metrics/email"
         }
     }
 
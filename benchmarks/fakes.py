@@ -0,0 +1,128 @@
+"""
+Deterministic stand-ins for Groq and Tavily so benchmarks measure this service, not the providers.
+
+install_fakes() swaps the LLM / search factories of main_agent, sql_agent, summarization_agent
+and tools, so the real agent graphs, tools and databases run unchanged around them.
+"""
+import hashlib
+import os
+import time
+from typing import Any, List, Optional
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from agents.web_search import local_search as fake_search
+from metrics import metrics_callback
+
+# simulated provider latency per LLM call
+BENCH_LLM_LATENCY_MS = float(os.getenv("BENCH_LLM_LATENCY_MS", 0))
+# every n-th question makes the main agent call a note tool first (0 disables tool calls)
+BENCH_TOOL_CALL_EVERY = int(os.getenv("BENCH_TOOL_CALL_EVERY", 4))
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha1(text.encode()).hexdigest()[:8], 16)
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Tool-calling chat model with reproducible output.
+    The reply depends only on the last human message, so runs are comparable.
+    """
+
+    model_name: str = "fake-model"
+    latency_ms: float = BENCH_LLM_LATENCY_MS
+    tool_call_every: int = BENCH_TOOL_CALL_EVERY
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name}
+
+    def _get_ls_params(self, stop=None, **kwargs):
+        params = super()._get_ls_params(stop=stop, **kwargs)
+        params["ls_model_name"] = self.model_name
+        return params
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(t, "name", None) or getattr(t, "__name__", "") for t in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        prompt = "".join(str(m.content) for m in messages)
+        if isinstance(last, ToolMessage):
+            content = f"Based on the tool result: {str(last.content)[:120]}"
+            return AIMessage(content=content)
+
+        question = str(last.content)
+        if (self.tool_call_every and "list_recent_notes" in self.tool_names
+                and _digest(question) % self.tool_call_every == 0):
+            return AIMessage(content="", tool_calls=[{
+                "name": "list_recent_notes", "args": {"limit": 5}, "id": f"call_{_digest(prompt):x}",
+            }])
+        words = question.split()
+        content = f"Answer ({len(messages)} messages in context): " + " ".join(reversed(words[:40]))
+        return AIMessage(content=content)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        message = self._reply(messages)
+        input_tokens = sum(_estimate_tokens(str(m.content)) for m in messages)
+        output_tokens = _estimate_tokens(str(message.content))
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeSummaryModel(FakeChatModel):
+    """Summaries are the first characters of every conversation line, capped in size"""
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        text = str(messages[-1].content)
+        lines = [line[:60] for line in text.splitlines() if line.strip()]
+        return AIMessage(content="\n".join(lines[-20:]))
+
+
+def install_fakes(latency_ms: float = BENCH_LLM_LATENCY_MS):
+    """Route every agent of the process to the fakes; call before the first request"""
+    from agents import main_agent, sql_agent, summarization_agent, tools
+
+    main_llm = FakeChatModel(model_name="fake-main", latency_ms=latency_ms, tags=["main_agent"])
+    sql_llm = FakeChatModel(model_name="fake-sql", latency_ms=latency_ms, tool_call_every=0)
+    summary_llm = FakeSummaryModel(model_name="fake-summary", latency_ms=latency_ms)
+
+    for llm in (main_llm, sql_llm, summary_llm):
+        llm.callbacks = [metrics_callback]
+
+    main_agent.get_llm = lambda: main_llm
+    sql_agent.get_llm = lambda: sql_llm
+    summarization_agent.get_llm = lambda: summary_llm
+    # the search cache stays in front of the fake, as it is in front of Tavily
+    tools.get_search_provider = lambda: fake_search
+    tools.get_search_tool.cache_clear()
+    main_agent.get_main_agent.cache_clear()
+    summarization_agent.get_summarization_chain.cache_clear()
+    sql_agent._agent_cache.update(version=None, agent=None)
+
+
+def fake_conversation(i: int) -> tuple:
+    """(human, ai) texts of a plausible size for seeding sessions"""
+    human = f"Question {i}: what should I do about task {i % 17} and the notes tagged work?"
+    ai = (f"For task {i % 17}, start with the open items from yesterday, then review the notes "
+          f"tagged work. " * (1 + i % 4)).strip()
+    return human, ai
@@ -0,0 +1,66 @@
+"""
+Import-time budget for the API process.
+
+    python benchmarks/import_time.py
+
+Imports api.py in fresh interpreters, fails (exit code 1) when the best run exceeds
+IMPORT_TIME_BUDGET_SECONDS or when a module that must stay lazy was imported.
+"""
+import os
+import json
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", 2.0))
+RUNS = int(os.getenv("IMPORT_TIME_RUNS", 3))
+
+# heavy clients and toolkits, only loaded by the agent factories / warmup()
+LAZY_MODULES = [
+    "langchain_groq",
+    "langchain_tavily",
+    "langchain_ollama",
+    "langchain.agents",
+    "langchain_community.tools.sql_database.tool",
+    "langchain_community.utilities.sql_database",
+    "databases.notes_vector_index",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import api
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure() -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    # clients are never built at import time, placeholder keys only satisfy stray checks
+    env.setdefault("GROQ_API_KEY", "import-time-check")
+    env.setdefault("TAVILY_API_KEY", "import-time-check")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=root, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> int:
+    runs = [measure() for _ in range(RUNS)]
+    best = min(run["seconds"] for run in runs)
+    loaded = sorted({module for run in runs for module in run["loaded"]})
+    print(f"import api: best {best:.3f}s of {RUNS} runs (budget {IMPORT_TIME_BUDGET_SECONDS:.3f}s)")
+    failed = False
+    if best > IMPORT_TIME_BUDGET_SECONDS:
+        print("FAIL: import time over budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: imported eagerly: {', '.join(loaded)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Offline load test: the real API, agents, tools and SQLite databases, with fake LLM and search providers.
+
+    python benchmarks/load_test.py --scenario mixed --requests 500 --concurrency 16
+
+Databases are created and seeded in a temporary directory (or --db-dir) before the API is
+imported. Reports throughput, p50/p95/p99 latency, memory, and the span breakdown from metrics.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("chat", "history", "list", "mixed")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=50, help="seeded sessions")
+    parser.add_argument("--messages-per-session", type=int, default=200)
+    parser.add_argument("--notes", type=int, default=5000, help="seeded notes")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated provider latency")
+    parser.add_argument("--db-dir", help="keep the databases here instead of a temporary directory")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="track the Python heap peak with tracemalloc (slows every request down)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """Must run before api / databases are imported: their engines are created at import time"""
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="agent-bench-")
+    os.makedirs(db_dir, exist_ok=True)
+    os.environ["SESSION_DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'sessions.db')}"
+    os.environ["NOTES_DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'notes.db')}"
+    os.environ["EMAIL_OUTBOX_DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'email_outbox.db')}"
+    os.environ["NOTES_VECTOR_INDEX_DIR"] = os.path.join(db_dir, "notes_index")
+    # measure the main agent; routed requests would skip it entirely
+    os.environ["ROUTER_ENABLED"] = "0"
+    os.environ["AGENT_WARMUP"] = "0"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+    sys.path.insert(0, ROOT)
+    return db_dir
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, name: str, session_ids: list, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def one(i: int):
+        session_id = session_ids[i % len(session_ids)]
+        kind = name if name != "mixed" else ("chat", "history", "chat", "list")[i % 4]
+        if kind == "chat":
+            return await client.post("/query/chat", json={
+                "query": f"What is the status of task {i % 17}? Check my notes if needed.",
+                "session_id": session_id,
+            })
+        if kind == "history":
+            return await client.get(f"/sessions/{session_id}", params={"limit": 50})
+        return await client.get("/sessions", params={"limit": 50})
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await one(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+async def main(args) -> dict:
+    db_dir = configure_environment(args)
+
+    import httpx
+    import api
+    import metrics
+    from benchmarks.fakes import install_fakes
+    from benchmarks.seed import seed_notes, seed_sessions
+
+    api.init_session_db()
+    api.init_notes_db()
+    seed_start = time.perf_counter()
+    session_ids = seed_sessions(args.sessions, args.messages_per_session)
+    seed_notes(args.notes)
+    seed_seconds = time.perf_counter() - seed_start
+
+    install_fakes(latency_ms=args.llm_latency_ms)
+    await api.startup_event()
+
+    if args.trace_memory:
+        tracemalloc.start()
+    transport = httpx.ASGITransport(app=api.app)
+    scenarios = [args.scenario] if args.scenario != "mixed" else ["history", "list", "chat", "mixed"]
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in scenarios:
+                results.append(await run_scenario(client, name, session_ids, args.requests, args.concurrency))
+        # let background summarization catch up so its cost shows in the report
+        while api.summarization_worker.metrics()["queue_depth"]:
+            await asyncio.sleep(0.05)
+    finally:
+        peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        tracemalloc.stop()
+        await api.shutdown_event()
+
+    spans = {
+        key[0]: {"count": count, "total_ms": total * 1000, "mean_ms": total / count * 1000}
+        for key, (total, count) in sorted(metrics.span_duration.totals().items())
+    }
+    return {
+        "db_dir": db_dir,
+        "seeded": {"sessions": args.sessions, "messages_per_session": args.messages_per_session,
+                   "notes": args.notes, "seconds": seed_seconds},
+        "results": results,
+        "memory": {
+            "traced_peak_mb": None if peak is None else peak / 1024 / 1024,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "summarization": api.summarization_worker.metrics(),
+        "spans": spans,
+    }
+
+
+def print_report(report: dict):
+    seeded = report["seeded"]
+    print(f"seeded {seeded['sessions']} sessions x {seeded['messages_per_session']} messages, "
+          f"{seeded['notes']} notes in {seeded['seconds']:.1f}s ({report['db_dir']})")
+    print(f"{'scenario':<10}{'reqs':>7}{'conc':>6}{'err':>5}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for r in report["results"]:
+        print(f"{r['scenario']:<10}{r['requests']:>7}{r['concurrency']:>6}{r['errors']:>5}{r['throughput_rps']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+    memory = report["memory"]
+    traced = "" if memory["traced_peak_mb"] is None else f"traced peak {memory['traced_peak_mb']:.1f} MB, "
+    print(f"memory: {traced}max RSS {memory['max_rss_mb']:.1f} MB")
+    worker = report["summarization"]
+    print(f"summarization: {worker['summarized']} summaries / {worker['processed']} jobs, "
+          f"max lag {worker['max_lag_seconds']:.2f}s, failed {worker['failed']}")
+    print(f"{'span':<32}{'count':>8}{'mean ms':>10}{'total ms':>12}")
+    for name, span in report["spans"].items():
+        print(f"{name:<32}{span['count']:>8}{span['mean_ms']:>10.2f}{span['total_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
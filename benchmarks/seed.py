@@ -0,0 +1,49 @@
+"""Fill the session and notes databases with large, deterministic data sets"""
+import random
+from databases.session_database import SessionLocal, SessionManager
+from databases.notes_database import NotesSessionLocal, Note, Tag
+from benchmarks.fakes import fake_conversation
+
+TAGS = ["work", "personal", "ideas", "health", "finance", "travel", "reading", "shopping"]
+WORDS = ("budget meeting plan review draft release invoice trip doctor book groceries "
+         "roadmap goal deadline project client call email report design").split()
+
+
+def seed_sessions(count: int, messages_per_session: int) -> list:
+    """Create sessions holding `messages_per_session` messages each, returns their ids"""
+    ids = []
+    db = SessionLocal()
+    try:
+        manager = SessionManager(db)
+        for s in range(count):
+            session = manager.create_session(session_name=f"bench session {s}")
+            items = []
+            for i in range(messages_per_session // 2):
+                human, ai = fake_conversation(s * 1000 + i)
+                items.extend([("human", human), ("ai", ai)])
+            if items:
+                manager._stage_messages(session.id, items)
+                db.commit()
+            ids.append(session.id)
+    finally:
+        db.close()
+    return ids
+
+
+def seed_notes(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    db = NotesSessionLocal()
+    try:
+        tags = {name: db.query(Tag).filter_by(name=name).first() or Tag(name=name) for name in TAGS}
+        notes = []
+        for i in range(count):
+            words = rng.sample(WORDS, 6)
+            notes.append(Note(
+                title=" ".join(words[:2]).title(),
+                content=f"Note {i}: " + " ".join(rng.choice(WORDS) for _ in range(40)),
+                tags=[tags[name] for name in rng.sample(TAGS, rng.randint(0, 3))],
+            ))
+        db.add_all(notes)
+        db.commit()
+    finally:
+        db.close()
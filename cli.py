@@ -1,4 +1,5 @@
 import requests
+import json
 from groq import Groq
 import warnings
 import pygame
@@ -123,11 +124,11 @@ def get_session(session_id: str):
     response.raise_for_status()
     return response.json()
 
-def load_sessions():
-    """Load all sessions"""
-    response = requests.get(f"{BASE_URL}/sessions")
+def load_sessions(limit: int = 50):
+    """Load the most recently active sessions"""
+    response = requests.get(f"{BASE_URL}/sessions", params={"limit": limit})
     response.raise_for_status()
-    return response.json()
+    return response.json()["sessions"]
 
 def create_session(session_name: str = None):
     """Create a new session"""
@@ -152,6 +153,21 @@ def send_message(session_id: str, message: str, enable_history: bool = False):
     response.raise_for_status()
     return response.json()
 
+def stream_message(session_id: str, message: str, enable_history: bool = False):
+    """Send a message and yield (event, data) pairs while the agent streams its answer"""
+    payload = {"query": message,
+               "session_id": session_id,
+               "enable_history": enable_history}
+    with requests.post(f"{BASE_URL}/query/chat/stream", json=payload, stream=True) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event:
+                yield event, json.loads(line[len("data: "):])
+                event = None
+
     
 def show_menu():
     while True:
@@ -179,7 +195,10 @@ def select_session():
         sessions = load_sessions()
         print("Sessions:")
         for i in range(len(sessions)):
-            print(f"- {i+1}, ID: {sessions[i]['id']}, Name: {sessions[i].get('session_name', 'N/A')}")
+            print(f"- {i+1}, ID: {sessions[i]['id']}, Name: {sessions[i].get('session_name', 'N/A')}, "
+                  f"Messages: {sessions[i].get('message_count', 0)}")
+            if sessions[i].get('last_message_preview'):
+                print(f"     {sessions[i]['last_message_preview']}")
         print()
         session_number = input("Select session number: ").strip()
         try:
@@ -259,10 +278,21 @@ def continue_conversation(user_input: str, session_id: str, enable_history: bool
     print_colored(user_input, "92")
     print()
     conversation.append({"role": "human", "content": user_input})
-    response = send_message(session_id, user_input, enable_history=enable_history)
-    agent_response = response.get("response", "")
+    agent_response = ""
+    # print tokens as they arrive instead of waiting for the whole answer
+    sys.stdout.write("\033[93m")
+    for event, data in stream_message(session_id, user_input, enable_history=enable_history):
+        if event == "token":
+            sys.stdout.write(data["content"])
+            sys.stdout.flush()
+        elif event == "done":
+            agent_response = data.get("response") or ""
+        elif event == "error":
+            agent_response = f"Error: {data.get('detail')}"
+            sys.stdout.write(agent_response)
+    sys.stdout.write("\033[0m\n")
+    sys.stdout.flush()
     conversation.append({"role": "ai", "content": agent_response})
-    print_colored(agent_response, "93")
     return agent_response
 
 def handle_voice_session(session_id: str):
@@ -0,0 +1,130 @@
+from typing import List, Optional
+from datetime import datetime, timedelta
+import uuid
+from langchain_core.messages import BaseMessage
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from databases.engine import create_async_db_engine
+from metrics import instrument_engine
+from databases.session_database import (
+    SESSION_DATABASE_URL,
+    SESSION_LEASE_TTL_SECONDS,
+    LEASE_OWNER,
+    SessionLease,
+    Session,
+    Message,
+    _session_stmt,
+    _next_seq_stmt,
+    _history_tail_stmt,
+    _messages_page_stmt,
+    _messages_page,
+    _list_sessions_stmt,
+    _sessions_page,
+    _new_messages,
+    _session_aggregates_stmt,
+    _assemble_history,
+    _lease_takeover_stmt,
+    _lease_release_stmt,
+)
+
+# same database as session_database, reached through the asyncio driver (aiosqlite for SQLite)
+async_engine = create_async_db_engine(SESSION_DATABASE_URL)
+instrument_engine(async_engine.sync_engine, "sessions")
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_session_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+class AsyncSessionManager:
+    """Async twin of SessionManager for the API, runs the same statements without blocking the loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_session(self, session_name: Optional[str] = None) -> Session:
+        session = Session(
+            id=str(uuid.uuid4()),
+            session_name=session_name,
+            message_count=0,
+            last_activity_at=datetime.utcnow(),
+        )
+        self.db.add(session)
+        await self.db.commit()
+        return session
+
+    async def get_session(self, session_id: str) -> Optional[Session]:
+        return (await self.db.execute(_session_stmt(session_id))).scalar_one_or_none()
+
+    async def _stage_messages(self, session_id: str, items, summary: Optional[str] = None) -> List[Message]:
+        first_seq = ((await self.db.execute(_next_seq_stmt(session_id))).scalar() or 0) + 1
+        messages = _new_messages(session_id, items, first_seq)
+        self.db.add_all(messages)
+        await self.db.execute(_session_aggregates_stmt(session_id, messages, summary))
+        await self.db.flush()
+        return messages
+
+    async def save_message(self, session_id: str, role: str, content: str) -> Message:
+        message = (await self._stage_messages(session_id, [(role, content)]))[0]
+        await self.db.commit()
+        return message
+
+    async def save_turn(self, session_id: str, human_content: str, ai_content: str,
+                        summary: Optional[str] = None, commit: bool = True) -> List[Message]:
+        messages = await self._stage_messages(
+            session_id, [("human", human_content), ("ai", ai_content)], summary=summary
+        )
+        if commit:
+            await self.db.commit()
+        return messages
+
+    async def get_chat_history(self, session_id: str, token_budget: Optional[int] = None) -> List[BaseMessage]:
+        session = await self.get_session(session_id)
+        if not session:
+            return []
+        tail = (await self.db.execute(_history_tail_stmt(session))).scalars().all()
+        chat_history, backfilled = _assemble_history(session, tail, token_budget)
+        if backfilled:
+            await self.db.commit()
+        return chat_history
+
+    async def get_messages_page(self, session_id: str, before: Optional[int] = None,
+                                after: Optional[int] = None, limit: int = 50):
+        stmt = _messages_page_stmt(session_id, before, after, limit)
+        rows = (await self.db.execute(stmt)).scalars().all()
+        return _messages_page(rows, after, limit)
+
+    async def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                            name_prefix: Optional[str] = None):
+        stmt = _list_sessions_stmt(cursor, name_prefix)
+        if limit is None:
+            return (await self.db.execute(stmt)).scalars().all()
+        rows = (await self.db.execute(stmt.limit(limit + 1))).scalars().all()
+        return _sessions_page(rows, limit)
+
+    async def delete_session(self, session_id: str) -> bool:
+        await self.db.execute(delete(Message).where(Message.session_id == session_id))
+        deleted = (await self.db.execute(delete(Session).where(Session.id == session_id))).rowcount
+        await self.db.commit()
+        return deleted > 0
+
+    async def try_acquire_lease(self, key: str, owner: str = LEASE_OWNER,
+                                ttl_seconds: float = SESSION_LEASE_TTL_SECONDS) -> bool:
+        now = datetime.utcnow()
+        if (await self.db.execute(_lease_takeover_stmt(key, owner, now, ttl_seconds))).rowcount:
+            await self.db.commit()
+            return True
+        self.db.add(SessionLease(key=key, owner=owner, expires_at=now + timedelta(seconds=ttl_seconds)))
+        try:
+            await self.db.commit()
+            return True
+        except IntegrityError:
+            await self.db.rollback()
+            return False
+
+    async def release_lease(self, key: str, owner: str = LEASE_OWNER):
+        await self.db.execute(_lease_release_stmt(key, owner))
+        await self.db.commit()
@@ -0,0 +1,137 @@
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import Column, DateTime, Integer, String, Text, and_, func, or_, select, update
+from sqlalchemy.orm import Session as DBSession, declarative_base, sessionmaker
+from databases.engine import create_db_engine
+from metrics import instrument_engine
+
+load_dotenv()
+
+EMAIL_OUTBOX_DATABASE_URL = os.getenv("EMAIL_OUTBOX_DATABASE_URL", "sqlite:///./email_outbox.db")
+
+Base = declarative_base()
+engine = create_db_engine(EMAIL_OUTBOX_DATABASE_URL, echo=False)
+instrument_engine(engine, "email_outbox")
+OutboxSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+QUEUED = "queued"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class OutboxEmail(Base):
+    """
+    One email waiting for, or done with, delivery.
+    queued -> sending (claimed by a sender until claimed_until) -> sent | failed,
+    a failed attempt that will be retried goes back to queued with a later next_attempt_at.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String(320), nullable=False)
+    subject = Column(String(998), nullable=False, default="")
+    body = Column(Text, nullable=False, default="")
+    status = Column(String(16), nullable=False, default=QUEUED, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    claimed_by = Column(String, nullable=True)
+    claimed_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+def get_outbox_db():
+    db = OutboxSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def init_outbox_db():
+    Base.metadata.create_all(engine)
+
+
+def _claimable(now: datetime):
+    # due emails, and emails whose sender died mid-batch
+    return or_(
+        and_(OutboxEmail.status == QUEUED, OutboxEmail.next_attempt_at <= now),
+        and_(OutboxEmail.status == SENDING, OutboxEmail.claimed_until < now),
+    )
+
+
+class EmailOutbox:
+    """Persistent queue of outgoing email, shared by the send_email tool and the background sender"""
+
+    def __init__(self, db: DBSession):
+        self.db = db
+
+    def enqueue(self, recipient: str, subject: str, body: str) -> OutboxEmail:
+        email = OutboxEmail(recipient=recipient, subject=subject, body=body)
+        self.db.add(email)
+        self.db.commit()
+        return email
+
+    def claim(self, owner: str, limit: int, claim_seconds: float) -> List[OutboxEmail]:
+        """
+        Take up to `limit` due emails for this sender. The claim expires after claim_seconds,
+        so emails held by a crashed sender are picked up again; concurrent senders never
+        claim the same row because the UPDATE re-checks the condition.
+        """
+        now = datetime.utcnow()
+        ids = list(self.db.scalars(
+            select(OutboxEmail.id).where(_claimable(now)).order_by(OutboxEmail.id).limit(limit)
+        ))
+        if not ids:
+            return []
+        self.db.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(ids), _claimable(now))
+            .values(status=SENDING, claimed_by=owner, claimed_until=now + timedelta(seconds=claim_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return list(self.db.scalars(
+            select(OutboxEmail)
+            .where(OutboxEmail.id.in_(ids), OutboxEmail.claimed_by == owner, OutboxEmail.status == SENDING)
+            .order_by(OutboxEmail.id)
+        ))
+
+    def mark_sent(self, email: OutboxEmail):
+        email.status = SENT
+        email.attempts += 1
+        email.sent_at = datetime.utcnow()
+        email.last_error = None
+        email.claimed_by = email.claimed_until = None
+        self.db.commit()
+
+    def mark_failed(self, email: OutboxEmail, error: str, retry_in: Optional[float]):
+        """Record a failed attempt; retried after retry_in seconds, or given up when it is None"""
+        email.attempts += 1
+        email.last_error = error[:2000]
+        email.claimed_by = email.claimed_until = None
+        if retry_in is None:
+            email.status = FAILED
+        else:
+            email.status = QUEUED
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_in)
+        self.db.commit()
+
+    def get(self, email_id: int) -> Optional[OutboxEmail]:
+        return self.db.get(OutboxEmail, email_id)
+
+    def list_recent(self, status: Optional[str] = None, limit: int = 50) -> List[OutboxEmail]:
+        query = select(OutboxEmail).order_by(OutboxEmail.id.desc()).limit(limit)
+        if status:
+            query = query.where(OutboxEmail.status == status)
+        return list(self.db.scalars(query))
+
+    def counts(self) -> dict:
+        rows = self.db.execute(select(OutboxEmail.status, func.count()).group_by(OutboxEmail.status)).all()
+        counts = {status: 0 for status in (QUEUED, SENDING, SENT, FAILED)}
+        counts.update({status: count for status, count in rows})
+        return counts
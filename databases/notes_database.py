@@ -1,18 +1,45 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Table
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Table, text, inspect, false
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import relationship, declarative_base, sessionmaker, selectinload, Session as DBSession
+from typing import List, Optional
 from sqlalchemy.sql import func
-from sqlalchemy import create_engine
 from dotenv import load_dotenv
-from langchain_community.utilities import SQLDatabase
+from databases.engine import create_db_engine
+from databases.notes_result_cache import NotesResultCache, track_table_writes
+from metrics import instrument_engine
 load_dotenv()
 import os
+import re
+import threading
 
 
 Base = declarative_base()
 NOTES_DATABASE_URL = os.getenv("NOTES_DATABASE_URL", "sqlite:///./notes.db")
 
-engine = create_engine(NOTES_DATABASE_URL, echo=False)
-db = SQLDatabase.from_uri(NOTES_DATABASE_URL)
+# tables the SQL agent is allowed to see
+NOTES_TABLES = ["notes", "tags", "note_tag"]
+
+engine = create_db_engine(NOTES_DATABASE_URL, echo=False)
+instrument_engine(engine, "notes")
+
+
+def _shared_table_versions(tables) -> Optional[tuple]:
+    """Trigger-maintained write counters, so writes of other processes invalidate cached results too"""
+    if engine.dialect.name != "sqlite":
+        return ()
+    try:
+        with engine.connect() as conn:
+            versions = dict(conn.execute(text("SELECT name, version FROM notes_table_versions")).all())
+    except OperationalError:
+        # init_notes_db has not created the table yet
+        return None
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+# SELECT results of the SQL agent, invalidated by writes to the tables they read
+notes_result_cache = NotesResultCache(NOTES_TABLES, shared_versions=_shared_table_versions)
+track_table_writes(engine, notes_result_cache)
+NotesSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 # Many-to-many association table (junction table)
 note_tag = Table(
     "note_tag",
@@ -56,13 +83,328 @@ class Note(Base):
     is_archived = Column(
         Boolean,
         nullable=False,
-        server_default=func.false()   # or default=False
+        # sql false() renders as 0 on SQLite, func.false() would emit an unknown false() call
+        server_default=false(),
+        default=False,
     )
 
     tags = relationship("Tag", secondary=note_tag, back_populates="notes")
 
+# full-text index over notes, an external-content FTS5 table kept in sync by triggers
+# so every write path (ORM, SQL agent, manual SQL) updates it
+NOTES_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, content, content='notes', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+# change log for the semantic index (databases/notes_vector_index.py): every write that can
+# change a note's embedding appends its id, the index replays the log incrementally
+NOTES_VECTOR_LOG_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS notes_vector_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        note_id INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_vector_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_vector_log(note_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_vector_update AFTER UPDATE OF title, content, is_archived ON notes BEGIN
+        INSERT INTO notes_vector_log(note_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_vector_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_vector_log(note_id) VALUES (old.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_vector_tag_insert AFTER INSERT ON note_tag BEGIN
+        INSERT INTO notes_vector_log(note_id) VALUES (new.note_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_vector_tag_delete AFTER DELETE ON note_tag BEGIN
+        INSERT INTO notes_vector_log(note_id) VALUES (old.note_id);
+    END
+    """,
+]
+# write counters of the notes tables, bumped by triggers on every write path (this process,
+# other API workers, the CLI, manual SQL); the result cache compares them before a hit
+NOTES_TABLE_VERSIONS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS notes_table_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT OR IGNORE INTO notes_table_versions(name) VALUES " + ", ".join(f"('{table}')" for table in NOTES_TABLES),
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_version_{operation.lower()} AFTER {operation} ON {table} BEGIN
+        UPDATE notes_table_versions SET version = version + 1 WHERE name = '{table}';
+    END
+    """
+    for table in NOTES_TABLES
+    for operation in ("INSERT", "UPDATE", "DELETE")
+]
+# bm25 column weights: a hit in the title counts more than one in the body
+FTS_TITLE_WEIGHT = 10.0
+FTS_CONTENT_WEIGHT = 1.0
+
+
+def get_notes_db():
+    db = NotesSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 def init_notes_db():
     Base.metadata.create_all(engine)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            created = not conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'")
+            ).first()
+            for ddl in NOTES_FTS_DDL + NOTES_VECTOR_LOG_DDL + NOTES_TABLE_VERSIONS_DDL:
+                conn.execute(text(ddl))
+            if created:
+                # index the notes written before the FTS table existed
+                conn.execute(text("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"))
+
+
+def _fts_query(query: str, any_term: bool = False) -> str:
+    # quote every term so user text can never be parsed as FTS5 syntax
+    terms = [f'"{term}"' for term in re.findall(r"\w+", query)]
+    return (" OR " if any_term else " ").join(terms)
+
+
+def search_notes(query: str, limit: int = 10, include_archived: bool = False) -> list:
+    """
+    Ranked full-text search over note titles and contents (BM25).
+    Returns dicts with id, title, snippet (matches wrapped in [ ]), score, created_at, is_archived.
+    All terms must match; if nothing does, notes matching any term are returned instead.
+    """
+    if not re.search(r"\w", query or ""):
+        return []
+    if engine.dialect.name != "sqlite":
+        return _search_notes_like(query, limit, include_archived)
+
+    sql = text("""
+        SELECT notes.id, notes.title,
+               snippet(notes_fts, 1, '[', ']', '…', 12) AS snippet,
+               bm25(notes_fts, :title_weight, :content_weight) AS score,
+               notes.created_at, notes.is_archived
+        FROM notes_fts
+        JOIN notes ON notes.id = notes_fts.rowid
+        WHERE notes_fts MATCH :match
+          AND (:include_archived OR notes.is_archived = 0)
+        ORDER BY score
+        LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        for any_term in (False, True):
+            rows = conn.execute(sql, {
+                "match": _fts_query(query, any_term),
+                "title_weight": FTS_TITLE_WEIGHT,
+                "content_weight": FTS_CONTENT_WEIGHT,
+                "include_archived": include_archived,
+                "limit": limit,
+            }).mappings().all()
+            if rows:
+                break
+    return [dict(row) for row in rows]
+
+
+def _search_notes_like(query: str, limit: int, include_archived: bool) -> list:
+    # databases without FTS5: plain substring search, unranked
+    pattern = f"%{query}%"
+    sql = text("""
+        SELECT id, title, substr(content, 1, 120) AS snippet, 0 AS score, created_at, is_archived
+        FROM notes
+        WHERE (title LIKE :pattern OR content LIKE :pattern)
+          AND (:include_archived OR is_archived = false)
+        ORDER BY created_at DESC
+        LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(sql, {"pattern": pattern, "include_archived": include_archived, "limit": limit})
+        return [dict(row) for row in rows.mappings()]
+
+
+_schema_lock = threading.Lock()
+_schema_cache = {"version": None, "db": None, "digest": None}
+
+
+def get_schema_version():
+    """
+    Changes whenever the notes DDL changes (SQLite bumps schema_version on every
+    CREATE/ALTER/DROP). Other dialects are assumed static for the process lifetime.
+    """
+    if engine.dialect.name != "sqlite":
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA schema_version")).scalar()
+
+
+def _current_schema() -> dict:
+    version = get_schema_version()
+    with _schema_lock:
+        if _schema_cache["db"] is None or _schema_cache["version"] != version:
+            # reflection (and the langchain import) happens here, never at import time,
+            # so a freshly created DB is picked up and startup stays fast
+            from databases.sql_guardrails import CachedSQLDatabase
+
+            existing = set(inspect(engine).get_table_names())
+            sql_db = CachedSQLDatabase(
+                engine,
+                include_tables=[table for table in NOTES_TABLES if table in existing],
+                sample_rows_in_table_info=0,
+                result_cache=notes_result_cache,
+            )
+            _schema_cache.update(version=version, db=sql_db, digest=sql_db.get_table_info())
+        return dict(_schema_cache)
+
+
+def get_sql_database():
+    """SQLDatabase over the shared engine, re-reflected only when the schema changes"""
+    return _current_schema()["db"]
+
+
+def get_schema_digest() -> tuple:
+    """(schema_version, CREATE TABLE statements of the notes tables) for prompt injection"""
+    schema = _current_schema()
+    return schema["version"], schema["digest"]
+
+
+class NotesManager:
+    """Typed note operations, the deterministic fast path next to the free-form SQL agent"""
+
+    def __init__(self, db: DBSession):
+        self.db = db
+
+    def _tags(self, names: List[str]) -> List[Tag]:
+        """
+        Tag rows for the names, matched case-insensitively so "Work" written by the SQL agent or
+        older data is reused; only unknown names are inserted, lowercased.
+        """
+        names = sorted({name.strip().lower() for name in names if name and name.strip()})
+        if not names:
+            return []
+        existing = {}
+        for tag in self.db.query(Tag).filter(func.lower(Tag.name).in_(names)).order_by(Tag.id):
+            existing.setdefault(tag.name.lower(), tag)
+        tags = []
+        for name in names:
+            tag = existing.get(name)
+            if tag is None:
+                tag = Tag(name=name)
+                self.db.add(tag)
+            tags.append(tag)
+        return tags
+
+    def _notes(self, include_archived: bool = False):
+        query = self.db.query(Note).options(selectinload(Note.tags))
+        if not include_archived:
+            query = query.filter(Note.is_archived.is_(False))
+        return query
+
+    def get_note(self, note_id: int) -> Optional[Note]:
+        return self._notes(include_archived=True).filter(Note.id == note_id).first()
+
+    def find_note_by_title(self, title: str, include_archived: bool = True) -> Optional[Note]:
+        """Newest note whose title matches, case-insensitively"""
+        return (
+            self._notes(include_archived)
+            .filter(func.lower(Note.title) == title.strip().lower())
+            .order_by(Note.created_at.desc(), Note.id.desc())
+            .first()
+        )
+
+    def create_note(self, content: str, title: Optional[str] = None, tags: Optional[List[str]] = None) -> Note:
+        note = Note(title=title, content=content, tags=self._tags(tags or []))
+        self.db.add(note)
+        self.db.commit()
+        return note
+
+    def update_note(self, note_id: int, title: Optional[str] = None, content: Optional[str] = None,
+                    tags: Optional[List[str]] = None) -> Optional[Note]:
+        """Only the fields that are passed change; tags replaces the whole tag list"""
+        note = self.get_note(note_id)
+        if not note:
+            return None
+        if title is not None:
+            note.title = title
+        if content is not None:
+            note.content = content
+        if tags is not None:
+            note.tags = self._tags(tags)
+        self.db.commit()
+        return note
+
+    def archive_note(self, note_id: int, archived: bool = True) -> Optional[Note]:
+        note = self.get_note(note_id)
+        if not note:
+            return None
+        note.is_archived = archived
+        self.db.commit()
+        return note
+
+    def list_recent(self, limit: int = 5, include_archived: bool = False) -> List[Note]:
+        return self._notes(include_archived).order_by(Note.created_at.desc(), Note.id.desc()).limit(limit).all()
+
+    def list_by_tag(self, tag: str, limit: int = 10, include_archived: bool = False) -> List[Note]:
+        return (
+            self._notes(include_archived)
+            .filter(Note.tags.any(func.lower(Tag.name) == tag.strip().lower()))
+            .order_by(Note.created_at.desc(), Note.id.desc())
+            .limit(limit)
+            .all()
+        )
+
+    def search(self, query: str, limit: int = 10, include_archived: bool = False) -> list:
+        return search_notes(query, limit=limit, include_archived=include_archived)
 
+    def semantic_search(self, query: str, limit: int = 10, include_archived: bool = False) -> list:
+        """Notes closest in meaning to the query, same row shape as search()"""
+        # numpy and the memory-mapped index are only loaded once semantic search is used
+        from databases.notes_vector_index import notes_vector_index
 
-    
\ No newline at end of file
+        hits = notes_vector_index.search(query, limit=limit, include_archived=include_archived)
+        notes = {note.id: note for note in self._notes(include_archived=True).filter(Note.id.in_([i for i, _ in hits]))}
+        return [
+            {
+                "id": note_id,
+                "title": notes[note_id].title,
+                "snippet": notes[note_id].content[:160],
+                "score": score,
+                "created_at": notes[note_id].created_at,
+                "is_archived": notes[note_id].is_archived,
+            }
+            for note_id, score in hits if note_id in notes
+        ]
@@ -0,0 +1,163 @@
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+
+NOTES_RESULT_CACHE_ENABLED = os.getenv("NOTES_RESULT_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+# total size of cached results, in bytes
+NOTES_RESULT_CACHE_MAX_BYTES = int(os.getenv("NOTES_RESULT_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+# results bigger than this are never cached, so one large scan can not flush the hot entries
+NOTES_RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("NOTES_RESULT_CACHE_MAX_ENTRY_BYTES", 256 * 1024))
+
+_READ_ONLY = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+_WRITE = re.compile(r"^\s*(insert|update|delete|replace)\b", re.IGNORECASE)
+_CTE_WRITE = re.compile(r"^\s*with\b.*\b(insert|update|delete)\b", re.IGNORECASE | re.DOTALL)
+_DDL = re.compile(r"^\s*(create|alter|drop)\b", re.IGNORECASE)
+_SQL_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def is_read_only(sql: str) -> bool:
+    return bool(_READ_ONLY.match(sql)) and not is_write(sql)
+
+
+def is_write(sql: str) -> bool:
+    return bool(_WRITE.match(sql) or _CTE_WRITE.match(sql))
+
+
+def normalize_sql(sql: str) -> str:
+    """Whitespace, comments and trailing semicolons do not change the result"""
+    sql = _SQL_COMMENT.sub(" ", sql)
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+class NotesResultCache:
+    """
+    Size bounded LRU of SELECT results.
+    Each table has a version counter that is bumped on every write to it; an entry stores
+    the versions of the tables its query reads and is stale as soon as one of them moves.
+    `shared_versions(tables)` adds counters kept in the database itself, which also move on
+    writes from other processes and manual edits; when it returns None nothing is cached.
+    """
+
+    def __init__(self, tables: list, max_bytes: int = NOTES_RESULT_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = NOTES_RESULT_CACHE_MAX_ENTRY_BYTES, shared_versions=None):
+        self.tables = list(tables)
+        self.shared_versions = shared_versions
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._table_patterns = {table: re.compile(rf"\b{re.escape(table)}\b", re.IGNORECASE) for table in self.tables}
+        self._versions = {table: 0 for table in self.tables}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def tables_in(self, sql: str) -> tuple:
+        """Tracked tables a statement mentions; all of them if none is recognised"""
+        found = tuple(table for table, pattern in self._table_patterns.items() if pattern.search(sql))
+        return found or tuple(self.tables)
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def snapshot(self, tables):
+        """Current versions of the tables, None when the shared versions can not be read"""
+        shared = self.shared_versions(tables) if self.shared_versions is not None else ()
+        if shared is None:
+            return None
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables) + tuple(shared)
+
+    def get(self, key, tables):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+        current = self.snapshot(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or current is None:
+                self.misses += 1
+                return None
+            versions, value, size = entry
+            if versions != current:
+                del self._entries[key]
+                self._bytes -= size
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, versions: tuple, value):
+        # versions come from before the query ran: a write racing with it leaves the entry stale, never wrong
+        size = sys.getsizeof(value) + sys.getsizeof(key[0])
+        if versions is None or size > self.max_entry_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (versions, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "table_versions": dict(self._versions),
+        }
+
+
+def track_table_writes(engine, cache: NotesResultCache):
+    """
+    Bump table versions for every INSERT/UPDATE/DELETE executed on the engine, whether it
+    comes from the SQL agent or the ORM. Versions are bumped again at commit so a reader
+    that ran between the statement and the commit can not keep a pre-commit result.
+    """
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        if _DDL.match(statement):
+            cache.clear()
+            return
+        if not is_write(statement):
+            return
+        tables = cache.tables_in(statement)
+        conn.info.setdefault("notes_written_tables", set()).update(tables)
+        cache.bump(tables)
+
+    @event.listens_for(engine, "commit")
+    def _on_commit(conn):
+        tables = conn.info.pop("notes_written_tables", None)
+        if tables:
+            cache.bump(tables)
+
+    @event.listens_for(engine, "rollback")
+    def _on_rollback(conn):
+        conn.info.pop("notes_written_tables", None)
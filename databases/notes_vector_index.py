@@ -0,0 +1,332 @@
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+import numpy as np
+from sqlalchemy import text, bindparam
+from databases.notes_database import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock between processes, run one process per index directory
+    fcntl = None
+
+# where the memory-mapped vectors and their row metadata live
+NOTES_VECTOR_INDEX_DIR = os.getenv("NOTES_VECTOR_INDEX_DIR", "./notes_index")
+# hashed feature dimensions per note (4 bytes each)
+NOTES_VECTOR_DIM = int(os.getenv("NOTES_VECTOR_DIM", 1024))
+# rows scored per matrix product, bounds the temporary score buffer
+SEARCH_CHUNK_ROWS = 65536
+# notes embedded per round trip while syncing
+SYNC_BATCH = 500
+
+TITLE_WEIGHT = 2.0
+TAG_WEIGHT = 1.5
+# character trigrams let "hiring" meet "hired" / "hire"
+TRIGRAM_WEIGHT = 0.25
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have i in is it its me my "
+    "of on or our so that the their them there these this to was we were what when where "
+    "which who why will with write wrote you your about".split()
+)
+_SUFFIXES = ("ings", "ing", "ies", "ied", "es", "ed", "s")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def _features(text_value: str, weight: float = 1.0):
+    for word in re.findall(r"[a-z0-9]+", (text_value or "").lower()):
+        if word in STOPWORDS:
+            continue
+        stem = _stem(word)
+        yield stem, weight
+        padded = f"#{stem}#"
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3], weight * TRIGRAM_WEIGHT
+
+
+def embed(documents: list, dim: int = NOTES_VECTOR_DIM) -> np.ndarray:
+    """
+    Signed feature hashing of stemmed words and their character trigrams,
+    log-scaled term frequencies, L2 normalized. `documents` are lists of (text, weight).
+    """
+    matrix = np.zeros((len(documents), dim), dtype=np.float32)
+    for row, parts in enumerate(documents):
+        counts = {}
+        for part, weight in parts:
+            for feature, feature_weight in _features(part, weight):
+                counts[feature] = counts.get(feature, 0.0) + feature_weight
+        for feature, count in counts.items():
+            digest = zlib.crc32(feature.encode())
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            matrix[row, digest % dim] += sign * (1.0 + math.log(count)) if count >= 1 else sign * count
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _note_document(title, content, tags) -> list:
+    parts = [(title or "", TITLE_WEIGHT), (content or "", 1.0)]
+    if tags:
+        parts.append((tags.replace(",", " "), TAG_WEIGHT))
+    return parts
+
+
+class NotesVectorIndex:
+    """
+    Embeddings of all notes in a memory-mapped float32 matrix (one row per note).
+    Rows are updated incrementally from notes_vector_log, which triggers on notes and
+    note_tag fill on every write path. Search is a chunked matrix-vector product with
+    query-side IDF weighting and an argpartition top-k, no LLM involved.
+    Processes sharing the directory serialize syncs with a lock file and reload the index
+    when another process saved it (meta.json generation changed).
+    """
+
+    def __init__(self, directory: str = NOTES_VECTOR_INDEX_DIR, dim: int = NOTES_VECTOR_DIM):
+        self.directory = directory
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._vectors = None
+        self._ids = None
+        self._archived = None
+        # per-dimension document frequency, for query-side IDF
+        self._df = None
+        self._rows = {}
+        self._free = []
+        self._count = 0
+        self._log_position = 0
+        self._generation = 0
+
+    # storage
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open_vectors(self, capacity: int, mode: str):
+        return np.memmap(self._path("vectors.f32"), dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        """Lock shared by every process using this directory: exclusive to sync, shared to search"""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path("index.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _stale(self) -> bool:
+        """Another process saved the index since this one loaded it"""
+        try:
+            with open(self._path("meta.json")) as f:
+                return json.load(f).get("generation", 0) != self._generation
+        except (OSError, ValueError):
+            return False
+
+    def _load(self) -> bool:
+        try:
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if meta.get("dim") != self.dim:
+            return False
+        self._vectors = self._open_vectors(meta["capacity"], "r+")
+        self._ids = np.load(self._path("ids.npy"))
+        self._archived = np.load(self._path("archived.npy"))
+        self._df = np.load(self._path("df.npy"))
+        self._count = meta["count"]
+        self._log_position = meta["log_position"]
+        self._generation = meta.get("generation", 0)
+        self._rows = {int(note_id): row for row, note_id in enumerate(self._ids[:self._count]) if note_id >= 0}
+        self._free = [row for row in range(self._count) if self._ids[row] < 0]
+        return True
+
+    def _create(self, capacity: int = 1024):
+        os.makedirs(self.directory, exist_ok=True)
+        self._vectors = self._open_vectors(capacity, "w+")
+        self._ids = np.full(capacity, -1, dtype=np.int64)
+        self._archived = np.zeros(capacity, dtype=bool)
+        self._df = np.zeros(self.dim, dtype=np.int64)
+        self._rows, self._free, self._count, self._log_position = {}, [], 0, 0
+
+    def _grow(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        self._vectors.flush()
+        # release the mapping, extend the file with zero rows, map it again
+        self._vectors = None
+        with open(self._path("vectors.f32"), "r+b") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._vectors = self._open_vectors(new_capacity, "r+")
+        self._ids = np.concatenate([self._ids, np.full(new_capacity - capacity, -1, dtype=np.int64)])
+        self._archived = np.concatenate([self._archived, np.zeros(new_capacity - capacity, dtype=bool)])
+
+    def _save(self):
+        self._generation += 1
+        self._vectors.flush()
+        np.save(self._path("ids.npy"), self._ids)
+        np.save(self._path("archived.npy"), self._archived)
+        np.save(self._path("df.npy"), self._df)
+        meta = {"dim": self.dim, "capacity": len(self._ids), "count": self._count,
+                "log_position": self._log_position, "generation": self._generation}
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    # updates
+
+    def _remove(self, note_id: int):
+        row = self._rows.pop(note_id, None)
+        if row is None:
+            return
+        self._df -= self._vectors[row] != 0
+        self._vectors[row] = 0
+        self._ids[row] = -1
+        self._archived[row] = False
+        self._free.append(row)
+
+    def _upsert(self, note_ids: list, vectors: np.ndarray, archived: list):
+        for note_id, vector, is_archived in zip(note_ids, vectors, archived):
+            row = self._rows.get(note_id)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    self._grow(self._count + 1)
+                    row = self._count
+                    self._count += 1
+                self._rows[note_id] = row
+            else:
+                self._df -= self._vectors[row] != 0
+            self._vectors[row] = vector
+            self._df += vector != 0
+            self._ids[row] = note_id
+            self._archived[row] = bool(is_archived)
+
+    def _fetch_notes(self, conn, note_ids: list):
+        stmt = text("""
+            SELECT n.id, n.title, n.content, n.is_archived, group_concat(t.name)
+            FROM notes n
+            LEFT JOIN note_tag nt ON nt.note_id = n.id
+            LEFT JOIN tags t ON t.id = nt.tag_id
+            WHERE n.id IN :ids
+            GROUP BY n.id
+        """).bindparams(bindparam("ids", expanding=True))
+        return conn.execute(stmt, {"ids": note_ids}).all()
+
+    def _apply(self, conn, note_ids: list):
+        for start in range(0, len(note_ids), SYNC_BATCH):
+            batch = note_ids[start:start + SYNC_BATCH]
+            rows = self._fetch_notes(conn, batch)
+            found = {row[0] for row in rows}
+            for note_id in batch:
+                if note_id not in found:
+                    self._remove(note_id)
+            if rows:
+                vectors = embed([_note_document(title, content, tags) for _, title, content, _, tags in rows], self.dim)
+                self._upsert([row[0] for row in rows], vectors, [row[3] for row in rows])
+
+    def rebuild(self):
+        """Embed every note from scratch"""
+        with self._lock, self._file_lock():
+            self._rebuild()
+
+    def _rebuild(self):
+        with engine.connect() as conn:
+            position = conn.execute(text("SELECT coalesce(max(id), 0) FROM notes_vector_log")).scalar()
+            self._create()
+            note_ids = list(conn.execute(text("SELECT id FROM notes ORDER BY id")).scalars())
+            self._apply(conn, note_ids)
+            self._log_position = position
+            self._save()
+
+    def sync(self) -> int:
+        """Replay note changes logged since the last sync, returns the number of notes touched"""
+        with self._lock, self._file_lock():
+            if (self._vectors is None or self._stale()) and not self._load():
+                self._rebuild()
+                return self._count
+            with engine.begin() as conn:
+                log = conn.execute(
+                    text("SELECT id, note_id FROM notes_vector_log WHERE id > :position ORDER BY id"),
+                    {"position": self._log_position},
+                ).all()
+                if not log:
+                    return 0
+                note_ids = list(dict.fromkeys(note_id for _, note_id in log))
+                self._apply(conn, note_ids)
+                self._log_position = log[-1][0]
+                self._save()
+                # every process of this database shares the directory, so no one needs these rows again
+                conn.execute(text("DELETE FROM notes_vector_log WHERE id <= :position"),
+                             {"position": self._log_position})
+            return len(note_ids)
+
+    # search
+
+    def search_many(self, queries: list, limit: int = 5, include_archived: bool = False) -> list:
+        """[(note_id, score), ...] per query, best first"""
+        self.sync()
+        with self._lock, self._file_lock(exclusive=False):
+            if self._stale():
+                self._load()
+            if not self._count:
+                return [[] for _ in queries]
+            documents = max(len(self._rows), 1)
+            idf = np.log((documents + 1) / (self._df + 1)).astype(np.float32) + 1.0
+            query_matrix = embed([[(query, 1.0)] for query in queries], self.dim) * idf
+            norms = np.linalg.norm(query_matrix, axis=1, keepdims=True)
+            np.divide(query_matrix, norms, out=query_matrix, where=norms > 0)
+
+            valid = self._ids[:self._count] >= 0
+            if not include_archived:
+                valid &= ~self._archived[:self._count]
+
+            best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            for start in range(0, self._count, SEARCH_CHUNK_ROWS):
+                stop = min(start + SEARCH_CHUNK_ROWS, self._count)
+                scores = query_matrix @ self._vectors[start:stop].T
+                scores[:, ~valid[start:stop]] = -np.inf
+                k = min(limit, stop - start)
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+                best_rows = np.concatenate([best_rows, top + start], axis=1)
+
+            results = []
+            for scores, rows in zip(best_scores, best_rows):
+                order = np.argsort(-scores)[:limit]
+                results.append([
+                    (int(self._ids[rows[i]]), float(scores[i]))
+                    for i in order if scores[i] > 0
+                ])
+            return results
+
+    def search(self, query: str, limit: int = 5, include_archived: bool = False) -> list:
+        return self.search_many([query], limit, include_archived)[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"notes": len(self._rows), "rows": self._count,
+                    "capacity": 0 if self._ids is None else len(self._ids), "dim": self.dim,
+                    "log_position": self._log_position}
+
+
+notes_vector_index = NotesVectorIndex()
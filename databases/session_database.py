@@ -1,21 +1,53 @@
-from requests import session
 from sqlalchemy.orm import Session as DBSession
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from typing import List, Optional
 import uuid
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, create_engine
-from sqlalchemy.orm import relationship, sessionmaker, noload
-from datetime import datetime
+from sqlalchemy import (
+    Column, Integer, String, DateTime, Text, ForeignKey, Index,
+    inspect, text, func, or_, and_, select, update, delete,
+)
+from sqlalchemy.orm import relationship, sessionmaker
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from agents.summarization_agent import call_summarization_agent
+from agents.context import count_tokens, get_context_budget
+from databases.engine import create_db_engine
+from metrics import instrument_engine
 import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+# characters of the last message kept on the session for listings
+PREVIEW_LENGTH = 80
 
 SESSION_DATABASE_URL = os.getenv("SESSION_DATABASE_URL", "sqlite:///./agent_sessions.db")
+# hard cap on messages read per history lookup, the token budget usually stops earlier
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", 200))
+# number of new (unsummarized) messages that triggers a new rolling summary
+SUMMARY_TRIGGER_MESSAGES = int(os.getenv("SUMMARY_TRIGGER_MESSAGES", 10))
+# ... or the number of new tokens, whichever comes first
+SUMMARY_TRIGGER_TOKENS = int(os.getenv("SUMMARY_TRIGGER_TOKENS", 2000))
+# idle sessions are compacted once they have at least this many new messages
+SUMMARY_IDLE_MIN_MESSAGES = int(os.getenv("SUMMARY_IDLE_MIN_MESSAGES", 2))
+# batch chat-turn writes from concurrent requests into shared transactions
+SESSION_GROUP_COMMIT = os.getenv("SESSION_GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", 5))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 64))
+# DB-backed session leases, needed when several API processes share the session database
+SESSION_LEASES = os.getenv("SESSION_LEASES", "0").lower() in ("1", "true", "yes")
+# a lease left behind by a crashed process is taken over after this long
+SESSION_LEASE_TTL_SECONDS = float(os.getenv("SESSION_LEASE_TTL_SECONDS", 180))
+# identifies this process as a lease holder
+LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
 
-engine = create_engine(
-    SESSION_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_db_engine(SESSION_DATABASE_URL)
+instrument_engine(engine, "sessions")
+# objects stay readable after commit, so writes need no refresh round trip
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
@@ -29,31 +61,318 @@ def get_session_db():
 
 def init_session_db():
     Base.metadata.create_all(bind=engine)
+    _migrate_session_db()
+
+
+def _add_missing_columns(conn, table) -> List[str]:
+    # create_all never alters existing tables, so add new columns to older databases here
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            added.append(column.name)
+    return added
+
+
+def _migrate_session_db():
+    with engine.begin() as conn:
+        existing = {column["name"] for column in inspect(conn).get_columns("sessions")}
+        added = _add_missing_columns(conn, Session.__table__)
+        added += _add_missing_columns(conn, Message.__table__)
+        if "seq" in added:
+            # number existing messages per session in insertion order
+            conn.execute(text("""
+                UPDATE messages SET seq = (
+                    SELECT COUNT(*) FROM messages AS m2
+                    WHERE m2.session_id = messages.session_id
+                      AND (m2.created_at < messages.created_at
+                           OR (m2.created_at = messages.created_at AND m2.id <= messages.id))
+                )
+            """))
+        if "summary_seq" in added:
+            # seed the watermark from an older datetime watermark, or from the
+            # summaries older versions stored as messages
+            if "summary_until" in existing:
+                conn.execute(text("""
+                    UPDATE sessions SET summary_seq = (
+                        SELECT MAX(seq) FROM messages
+                        WHERE messages.session_id = sessions.id
+                          AND messages.created_at <= sessions.summary_until
+                    ) WHERE summary_until IS NOT NULL
+                """))
+            else:
+                conn.execute(text("""
+                    UPDATE sessions SET
+                        summary = (SELECT content FROM messages
+                                   WHERE messages.session_id = sessions.id AND role = 'summary'
+                                   ORDER BY seq DESC LIMIT 1),
+                        summary_seq = (SELECT seq FROM messages
+                                       WHERE messages.session_id = sessions.id AND role = 'summary'
+                                       ORDER BY seq DESC LIMIT 1)
+                """))
+        if "message_count" in added:
+            # listing aggregates are maintained on write from now on, compute them once here
+            conn.execute(text(f"""
+                UPDATE sessions SET
+                    message_count = (SELECT COUNT(*) FROM messages
+                                     WHERE messages.session_id = sessions.id),
+                    last_message_at = (SELECT MAX(created_at) FROM messages
+                                       WHERE messages.session_id = sessions.id),
+                    last_message_preview = (SELECT substr(content, 1, {PREVIEW_LENGTH}) FROM messages
+                                            WHERE messages.session_id = sessions.id
+                                            ORDER BY seq DESC LIMIT 1)
+            """))
+        if "last_activity_at" in added:
+            conn.execute(text(
+                "UPDATE sessions SET last_activity_at = COALESCE(last_message_at, updated_at, created_at)"
+            ))
+        # indexes on pre-existing tables are not created by create_all either
+        for index in [*Session.__table__.indexes, *Message.__table__.indexes]:
+            index.create(conn, checkfirst=True)
 
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # keyset pagination of the session picker, most recently active first
+        Index("ix_sessions_last_activity", "last_activity_at", "id"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     session_name = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)    
-    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # rolling summary of every message up to (and including) seq == summary_seq
+    summary = Column(Text, nullable=True)
+    summary_seq = Column(Integer, nullable=True)
+    summary_token_count = Column(Integer, nullable=True)
+    # listing aggregates, maintained by save_message
+    message_count = Column(Integer, nullable=False, default=0)
+    last_message_at = Column(DateTime, nullable=True)
+    last_message_preview = Column(String, nullable=True)
+    last_activity_at = Column(DateTime, default=datetime.utcnow)
+    messages = relationship(
+        "Message", back_populates="session", cascade="all, delete-orphan", order_by="Message.seq"
+    )
 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # per-session ordering and keyset pagination
+        Index("ix_messages_session_seq", "session_id", "seq", unique=True),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     session_id = Column(String, ForeignKey("sessions.id"))
+    # monotonically increasing position of the message within its session
+    seq = Column(Integer, nullable=True)
     role = Column(String)  # "human" or "ai"
     content = Column(Text)
+    # cached tokenizer count so history assembly never re-tokenizes stored rows
+    token_count = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     session = relationship("Session", back_populates="messages")
 
 
 
+class SessionLease(Base):
+    """Cross-process mutex on a session: "turn:<id>" serializes chat turns, "summary:<id>" summarization"""
+    __tablename__ = "session_leases"
+
+    key = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+def _encode_cursor(activity: datetime, session_id: str) -> str:
+    return f"{activity.isoformat()}|{session_id}"
+
+
+def _decode_cursor(cursor: str):
+    try:
+        activity, session_id = cursor.split("|", 1)
+        return datetime.fromisoformat(activity), session_id
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+
+# Statement builders and pure helpers shared by SessionManager and AsyncSessionManager,
+# so the sync and async paths always run the same queries.
+
+def _session_stmt(session_id: str):
+    return select(Session).where(Session.id == session_id)
+
+
+def _next_seq_stmt(session_id: str):
+    # served by ix_messages_session_seq, no scan
+    return select(func.max(Message.seq)).where(Message.session_id == session_id)
+
+
+def _unsummarized_stmt(session: Session, *columns):
+    stmt = select(*(columns or (Message,))).where(
+        Message.session_id == session.id,
+        Message.role.in_(("human", "ai")),
+    )
+    if session.summary_seq is not None:
+        stmt = stmt.where(Message.seq > session.summary_seq)
+    return stmt
+
+
+def _history_tail_stmt(session: Session):
+    return _unsummarized_stmt(session).order_by(Message.seq.desc()).limit(HISTORY_MAX_MESSAGES)
+
+
+def _pending_stats_stmt(session: Session):
+    # rows written before token counts were cached are estimated from their length
+    return _unsummarized_stmt(
+        session,
+        func.count(Message.id),
+        func.coalesce(func.sum(func.coalesce(Message.token_count, func.length(Message.content) / 4)), 0),
+    )
+
+
+def _messages_page_stmt(session_id: str, before: Optional[int], after: Optional[int], limit: int):
+    stmt = select(Message).where(Message.session_id == session_id)
+    if after is not None:
+        return stmt.where(Message.seq > after).order_by(Message.seq).limit(limit + 1)
+    if before is not None:
+        stmt = stmt.where(Message.seq < before)
+    return stmt.order_by(Message.seq.desc()).limit(limit + 1)
+
+
+def _messages_page(rows: List[Message], after: Optional[int], limit: int):
+    page = rows[:limit]
+    if after is None:
+        page = list(reversed(page))
+    return page, len(rows) > limit
+
+
+def _list_sessions_stmt(cursor: Optional[str], name_prefix: Optional[str]):
+    stmt = select(Session)
+    if name_prefix:
+        escaped = name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = stmt.where(Session.session_name.like(f"{escaped}%", escape="\\"))
+    if cursor:
+        activity, session_id = _decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            Session.last_activity_at < activity,
+            and_(Session.last_activity_at == activity, Session.id < session_id),
+        ))
+    return stmt.order_by(Session.last_activity_at.desc(), Session.id.desc())
+
+
+def _sessions_page(rows: List[Session], limit: int):
+    sessions = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = _encode_cursor(sessions[-1].last_activity_at, sessions[-1].id)
+    return sessions, next_cursor
+
+
+def _new_messages(session_id: str, items, first_seq: int) -> List[Message]:
+    now = datetime.utcnow()
+    return [
+        Message(
+            id=str(uuid.uuid4()),
+            session_id=session_id,
+            seq=first_seq + i,
+            role=role,
+            content=content,
+            token_count=count_tokens(content),
+            created_at=now,
+        )
+        for i, (role, content) in enumerate(items)
+    ]
+
+
+def _session_aggregates_stmt(session_id: str, messages: List[Message], summary: Optional[str] = None):
+    values = {
+        Session.message_count: Session.message_count + len(messages),
+        Session.last_message_at: messages[-1].created_at,
+        Session.last_message_preview: (messages[-1].content or "")[:PREVIEW_LENGTH],
+        Session.last_activity_at: messages[-1].created_at,
+    }
+    if summary is not None:
+        values[Session.summary] = summary
+        values[Session.summary_seq] = messages[-1].seq
+        values[Session.summary_token_count] = count_tokens(summary)
+    return update(Session).where(Session.id == session_id).values(values)
+
+
+def _summary_cas_stmt(session: Session, summary: str, summary_seq: int):
+    """Move the watermark only if nobody else moved it since `session` was read"""
+    expected = (Session.summary_seq.is_(None) if session.summary_seq is None
+                else Session.summary_seq == session.summary_seq)
+    return (
+        update(Session)
+        .where(Session.id == session.id, expected)
+        .values(summary=summary, summary_seq=summary_seq, summary_token_count=count_tokens(summary))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _lease_takeover_stmt(key: str, owner: str, now: datetime, ttl_seconds: float):
+    # an expired lease, or one we already hold, can be (re)taken
+    return (
+        update(SessionLease)
+        .where(SessionLease.key == key, or_(SessionLease.expires_at < now, SessionLease.owner == owner))
+        .values(owner=owner, expires_at=now + timedelta(seconds=ttl_seconds))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _lease_release_stmt(key: str, owner: str):
+    return delete(SessionLease).where(SessionLease.key == key, SessionLease.owner == owner)
+
+
+def _map_messages(messages: List[Message]) -> List[BaseMessage]:
+    mapped = []
+    for msg in messages:
+        if msg.role == "human":
+            mapped.append(HumanMessage(content=msg.content))
+        elif msg.role == "ai":
+            mapped.append(AIMessage(content=msg.content))
+        elif msg.role == "summary":
+            mapped.append(AIMessage(content=f"[Summary of earlier conversation]: {msg.content}"))
+    return mapped
+
+
+def _assemble_history(session: Session, tail: List[Message], token_budget: Optional[int]):
+    """
+    Rolling summary plus the newest messages of `tail` (newest first) that fit in token_budget.
+    Returns (chat_history, backfilled) where backfilled tells if cached token counts were filled in.
+    """
+    if token_budget is None:
+        token_budget = get_context_budget()
+    backfilled = False
+
+    chat_history = []
+    if session.summary:
+        if session.summary_token_count is None:
+            session.summary_token_count = count_tokens(session.summary)
+            backfilled = True
+        token_budget -= session.summary_token_count
+        chat_history.append(AIMessage(content=f"[Summary of earlier conversation]: {session.summary}"))
+
+    # walk the tail newest-first and stop as soon as the budget is spent
+    recent = []
+    for message in tail:
+        if message.token_count is None:
+            message.token_count = count_tokens(message.content)
+            backfilled = True
+        if message.token_count > token_budget:
+            break
+        token_budget -= message.token_count
+        recent.append(message)
+
+    chat_history.extend(_map_messages(list(reversed(recent))))
+    return chat_history, backfilled
+
+
 class SessionManager:
     def __init__(self, db: DBSession):
         self.db = db
@@ -62,84 +381,235 @@ class SessionManager:
         session = Session(id=str(uuid.uuid4()), session_name=session_name)
         self.db.add(session)
         self.db.commit()
-        self.db.refresh(session)
         return session
 
     def get_session(self, session_id: str) -> Optional[Session]:
-        return self.db.query(Session).filter(Session.id == session_id).first()
+        return self.db.execute(_session_stmt(session_id)).scalar_one_or_none()
+
+    def _stage_messages(self, session_id: str, items, summary: Optional[str] = None) -> List[Message]:
+        """Add messages and bump the session aggregates in the current transaction"""
+        first_seq = (self.db.execute(_next_seq_stmt(session_id)).scalar() or 0) + 1
+        messages = _new_messages(session_id, items, first_seq)
+        self.db.add_all(messages)
+        self.db.execute(_session_aggregates_stmt(session_id, messages, summary))
+        # later stages in the same transaction must see these seq numbers
+        self.db.flush()
+        return messages
 
     def save_message(self, session_id: str, role: str, content: str) -> Message:
-        message = Message(
-            id=str(uuid.uuid4()),
-            session_id=session_id,
-            role=role,
-            content=content
-        )
-        self.db.add(message)
+        message = self._stage_messages(session_id, [(role, content)])[0]
         self.db.commit()
-        self.db.refresh(message)
         return message
 
-    def _map_messages(self, messages: List[Message]) -> List[BaseMessage]:
-        mapped = []
-        for msg in messages:
-            if msg.role == "human":
-                mapped.append(HumanMessage(content=msg.content))
-            elif msg.role == "ai":
-                mapped.append(AIMessage(content=msg.content))
-            elif msg.role == "summary":
-                mapped.append(AIMessage(content=f"[Summary of earlier conversation]: {msg.content}"))
-        return mapped
-
-    def get_chat_history(self, session_id: str) -> List[BaseMessage]:
+    def save_turn(self, session_id: str, human_content: str, ai_content: str,
+                  summary: Optional[str] = None, commit: bool = True) -> List[Message]:
+        """
+        Persist a whole chat turn (human + ai, optionally a new rolling summary covering it)
+        in one transaction, without refresh round trips.
+        """
+        messages = self._stage_messages(
+            session_id, [("human", human_content), ("ai", ai_content)], summary=summary
+        )
+        if commit:
+            self.db.commit()
+        return messages
+
+    def summarize_session(self, session: Session) -> Optional[str]:
+        """Fold every message after the watermark into the rolling summary"""
+        messages = self.db.execute(_unsummarized_stmt(session).order_by(Message.seq)).scalars().all()
+        if not messages:
+            return session.summary
+        summary = call_summarization_agent(messages, previous_summary=session.summary)
+        if self.db.execute(_summary_cas_stmt(session, summary, messages[-1].seq)).rowcount == 0:
+            # another worker summarized this watermark first, keep its summary
+            self.db.rollback()
+            return None
+        self.db.commit()
+        session.summary = summary
+        session.summary_seq = messages[-1].seq
+        session.summary_token_count = count_tokens(summary)
+        return summary
+
+    def summarize_if_needed(self, session_id: str, min_messages: int = SUMMARY_TRIGGER_MESSAGES) -> bool:
+        lease = f"summary:{session_id}"
+        if SESSION_LEASES and not self.try_acquire_lease(lease):
+            # another process is summarizing this session right now
+            return False
+        try:
+            session = self.get_session(session_id)
+            if not session:
+                return False
+            pending_count, pending_tokens = self.db.execute(_pending_stats_stmt(session)).one()
+            if pending_count == 0:
+                return False
+            if pending_count < min_messages and pending_tokens < SUMMARY_TRIGGER_TOKENS:
+                return False
+            return self.summarize_session(session) is not None
+        finally:
+            if SESSION_LEASES:
+                self.release_lease(lease)
+
+    def try_acquire_lease(self, key: str, owner: str = LEASE_OWNER,
+                          ttl_seconds: float = SESSION_LEASE_TTL_SECONDS) -> bool:
+        now = datetime.utcnow()
+        if self.db.execute(_lease_takeover_stmt(key, owner, now, ttl_seconds)).rowcount:
+            self.db.commit()
+            return True
+        self.db.add(SessionLease(key=key, owner=owner, expires_at=now + timedelta(seconds=ttl_seconds)))
+        try:
+            self.db.commit()
+            return True
+        except IntegrityError:
+            # held by someone else and not expired
+            self.db.rollback()
+            return False
+
+    def release_lease(self, key: str, owner: str = LEASE_OWNER):
+        self.db.execute(_lease_release_stmt(key, owner))
+        self.db.commit()
+
+    def find_idle_sessions(self, idle_before: datetime, min_messages: int = SUMMARY_IDLE_MIN_MESSAGES,
+                           limit: int = 100) -> List[str]:
+        """Sessions with no new message since idle_before that still have unsummarized messages"""
+        stmt = (
+            select(Message.session_id)
+            .join(Session, Session.id == Message.session_id)
+            .where(
+                Message.role.in_(("human", "ai")),
+                or_(Session.summary_seq.is_(None), Message.seq > Session.summary_seq),
+            )
+            .group_by(Message.session_id)
+            .having(func.max(Message.created_at) < idle_before)
+            .having(func.count(Message.id) >= min_messages)
+            .limit(limit)
+        )
+        return list(self.db.execute(stmt).scalars())
+
+    def get_chat_history(self, session_id: str, token_budget: Optional[int] = None) -> List[BaseMessage]:
+        """
+        Rolling summary plus the newest unsummarized messages that fit in token_budget.
+        Summaries are produced by the background worker, never on the request path.
+        """
         session = self.get_session(session_id)
         if not session:
             return []
-        
-        chat_history = []
-        # only get the last 10 messages
-        MSG_THRESHOLD = 10
-        msg_count = len(session.messages)
-        if msg_count > MSG_THRESHOLD:
-            latest_messages = session.messages[-MSG_THRESHOLD:]
-            msg_roles = [m.role for m in latest_messages]
-            has_summary = (False if "summary" not in msg_roles else True)
-            if has_summary:
-                summary_index = msg_roles.index("summary")
-                new_messages = latest_messages[summary_index:]
-                chat_history = self._map_messages(new_messages)
-                
-            else:
-                last_sum_index = None
-                for i, val in enumerate(session.messages):
-                    if val.role == "summary":
-                        last_sum_index = i
-                if last_sum_index:
-                    latest_messages = session.messages[last_sum_index:]
-                summary = call_summarization_agent(latest_messages)
-                chat_history.append(AIMessage(content=f"[Summary of earlier conversation]: {summary}"))
-                self.save_message(session_id, "summary", summary)
-
-        elif msg_count == MSG_THRESHOLD:
-            try:
-                summary = call_summarization_agent(session.messages)
-                chat_history.append(AIMessage(content=f"[Summary of earlier conversation]: {summary}"))
-                self.save_message(session_id, "summary", summary)
-            except Exception as e:
-                chat_history = self._map_messages(session.messages)
-        else:
-            chat_history = self._map_messages(session.messages)
-            
+        tail = self.db.execute(_history_tail_stmt(session)).scalars().all()
+        chat_history, backfilled = _assemble_history(session, tail, token_budget)
+        if backfilled:
+            self.db.commit()
         return chat_history
-    
-    def list_sessions(self) -> List[Session]:
-        # return sessions without chat history
-        return self.db.query(Session).options(noload(Session.messages)).all()
+
+    def get_messages_page(self, session_id: str, before: Optional[int] = None,
+                          after: Optional[int] = None, limit: int = 50):
+        """
+        Keyset page of a session's messages by seq, returned oldest first.
+        Without a cursor the newest `limit` messages are returned.
+        Returns (messages, has_more).
+        """
+        rows = self.db.execute(_messages_page_stmt(session_id, before, after, limit)).scalars().all()
+        return _messages_page(rows, after, limit)
+
+    def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                      name_prefix: Optional[str] = None):
+        """
+        Sessions ordered by last activity (newest first), without chat history.
+        With a limit, returns (sessions, next_cursor) where next_cursor feeds the next page.
+        """
+        stmt = _list_sessions_stmt(cursor, name_prefix)
+        if limit is None:
+            return self.db.execute(stmt).scalars().all()
+        rows = self.db.execute(stmt.limit(limit + 1)).scalars().all()
+        return _sessions_page(rows, limit)
 
     def delete_session(self, session_id: str) -> bool:
-        session = self.get_session(session_id)
-        if session:
-            self.db.delete(session)
-            self.db.commit()
-            return True
-        return False
+        # bulk delete instead of loading every message through the cascade
+        self.db.execute(delete(Message).where(Message.session_id == session_id))
+        deleted = self.db.execute(delete(Session).where(Session.id == session_id)).rowcount
+        self.db.commit()
+        return deleted > 0
+
+
+class GroupCommitWriter:
+    """
+    Collects chat turns from concurrent requests and commits them together,
+    so N turns arriving within GROUP_COMMIT_WINDOW_MS cost one transaction.
+    """
+
+    def __init__(self, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self.batches = 0
+        self.turns = 0
+
+    def submit(self, session_id: str, human_content: str, ai_content: str,
+               summary: Optional[str] = None) -> Future:
+        future = Future()
+        self._queue.put((future, (session_id, human_content, ai_content, summary)))
+        return future
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-group-commit", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _collect(self, first):
+        batch = [first]
+        wait_until = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = wait_until - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # keep the stop marker for _run
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _write(self, batch):
+        db = SessionLocal()
+        try:
+            manager = SessionManager(db)
+            try:
+                results = [manager.save_turn(*args, commit=False) for _, args in batch]
+                db.commit()
+            except Exception:
+                db.rollback()
+                results = None
+            if results is None:
+                # isolate the failing turn instead of failing the whole batch
+                for future, args in batch:
+                    try:
+                        future.set_result(manager.save_turn(*args))
+                    except Exception as e:
+                        db.rollback()
+                        future.set_exception(e)
+                return
+            for (future, _), messages in zip(batch, results):
+                future.set_result(messages)
+            self.batches += 1
+            self.turns += len(batch)
+        finally:
+            db.close()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._write(self._collect(job))
+
+
+group_commit_writer = GroupCommitWriter()
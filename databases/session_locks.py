@@ -0,0 +1,86 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from databases.session_database import SESSION_LEASES
+from databases.async_session_database import AsyncSessionLocal, AsyncSessionManager
+
+# how often a waiting turn retries a lease held by another process
+SESSION_LEASE_POLL_MS = float(os.getenv("SESSION_LEASE_POLL_MS", 100))
+
+
+class SessionBusyError(Exception):
+    """The session stayed locked by an earlier turn for longer than the caller wanted to wait"""
+
+
+class KeyedAsyncLock:
+    """
+    One asyncio.Lock per key, created on demand and dropped when nobody holds or waits for it.
+    asyncio.Lock wakes waiters in FIFO order, so turns on a key run in arrival order.
+    """
+
+    def __init__(self):
+        # key -> [lock, holders + waiters]
+        self._locks = {}
+
+    @asynccontextmanager
+    async def hold(self, key: str, timeout: float | None = None):
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            try:
+                await asyncio.wait_for(entry[0].acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise SessionBusyError(key)
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def __len__(self):
+        return len(self._locks)
+
+
+session_turn_locks = KeyedAsyncLock()
+
+
+async def _acquire_lease(key: str, deadline: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        async with AsyncSessionLocal() as db:
+            if await AsyncSessionManager(db).try_acquire_lease(key):
+                return
+        if loop.time() >= deadline:
+            raise SessionBusyError(key)
+        await asyncio.sleep(SESSION_LEASE_POLL_MS / 1000)
+
+
+async def _release_lease(key: str):
+    async with AsyncSessionLocal() as db:
+        await AsyncSessionManager(db).release_lease(key)
+
+
+@asynccontextmanager
+async def session_turn(session_id: str, wait_seconds: float | None = None):
+    """
+    Run one chat turn (history read, agent, persist) exclusively for its session.
+    Turns of the same session queue up in order, other sessions are not affected.
+    With SESSION_LEASES the turn also holds a DB lease, so this holds across processes.
+    Raises SessionBusyError if the session can not be taken within wait_seconds.
+    """
+    key = f"turn:{session_id}"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait_seconds if wait_seconds is not None else float("inf")
+    async with session_turn_locks.hold(key, wait_seconds):
+        if not SESSION_LEASES:
+            yield
+            return
+        await _acquire_lease(key, deadline)
+        try:
+            yield
+        finally:
+            # shielded so a cancelled turn (client disconnect, timeout) still frees the session
+            await asyncio.shield(_release_lease(key))
@@ -0,0 +1,136 @@
+import os
+import time
+from contextlib import contextmanager
+from sqlalchemy import text
+from langchain_community.utilities import SQLDatabase
+from langchain_community.utilities.sql_database import truncate_word
+from databases.notes_result_cache import NotesResultCache, NOTES_RESULT_CACHE_ENABLED, is_read_only, normalize_sql
+
+# wall-clock limit for one statement, including fetching its rows (SQLite only)
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", 5000))
+# rows returned to the agent before the result is cut
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 200))
+# characters of result text handed to the LLM
+SQL_RESULT_MAX_CHARS = int(os.getenv("SQL_RESULT_MAX_CHARS", 16000))
+# SQLite VM instructions between two deadline checks
+PROGRESS_HANDLER_STEPS = 1000
+
+
+@contextmanager
+def statement_timeout(connection, timeout_ms: int):
+    """
+    Abort the statement running on `connection` once `timeout_ms` has passed.
+    SQLite has no statement timeout, so a progress handler checks the deadline and
+    interrupts the VM; the driver then raises OperationalError("interrupted").
+    """
+    if timeout_ms <= 0 or connection.dialect.name != "sqlite":
+        yield
+        return
+    raw = connection.connection.dbapi_connection
+    deadline = time.monotonic() + timeout_ms / 1000
+    raw.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, PROGRESS_HANDLER_STEPS)
+    try:
+        yield
+    finally:
+        raw.set_progress_handler(None, 0)
+
+
+class GuardedSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase with bounded execution for agent generated SQL: statements time out,
+    rows are streamed from the cursor and the text result stops at a row cap and a
+    character budget, with a marker telling the agent the result was cut.
+    """
+
+    def __init__(self, *args, timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS, max_rows: int = SQL_MAX_ROWS,
+                 max_chars: int = SQL_RESULT_MAX_CHARS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout_ms = timeout_ms
+        self.max_rows = max_rows
+        self.max_chars = max_chars
+
+    def run(self, command, fetch="all", include_columns=False, *, parameters=None, execution_options=None):
+        if fetch == "cursor" or not isinstance(command, str):
+            return super().run(command, fetch, include_columns,
+                               parameters=parameters, execution_options=execution_options)
+
+        with self._engine.begin() as connection:
+            with statement_timeout(connection, self.timeout_ms):
+                cursor = connection.execute(text(command), parameters or {},
+                                            execution_options=execution_options or {})
+                if not cursor.returns_rows:
+                    return ""
+                try:
+                    return self._format_rows(cursor, fetch, include_columns)
+                finally:
+                    cursor.close()
+
+    def fetch_rows(self, command: str, parameters: dict = None):
+        """(columns, rows, truncated) of a statement, under the same timeout and row cap as run()"""
+        with self._engine.begin() as connection:
+            with statement_timeout(connection, self.timeout_ms):
+                cursor = connection.execute(text(command), parameters or {})
+                if not cursor.returns_rows:
+                    return [], [], False
+                try:
+                    rows = cursor.fetchmany(self.max_rows + 1)
+                    return list(cursor.keys()), [tuple(row) for row in rows[:self.max_rows]], len(rows) > self.max_rows
+                finally:
+                    cursor.close()
+
+    def _format_rows(self, cursor, fetch: str, include_columns: bool) -> str:
+        # same text as SQLDatabase.run (str of a list of tuples/dicts), built row by row
+        limit = 1 if fetch == "one" else self.max_rows
+        pieces = []
+        size = 2
+        marker = None
+        for count, row in enumerate(cursor):
+            if count >= limit:
+                if fetch != "one":
+                    marker = f"[truncated: more than {self.max_rows} rows, narrow the query or add a LIMIT]"
+                break
+            values = {column: truncate_word(value, length=self._max_string_length)
+                      for column, value in row._asdict().items()}
+            piece = repr(values if include_columns else tuple(values.values()))
+            if pieces and size + len(piece) + 2 > self.max_chars:
+                marker = (f"[truncated: result exceeds {self.max_chars} characters after {count} rows, "
+                          f"select fewer columns or rows]")
+                break
+            pieces.append(piece)
+            size += len(piece) + 2
+        if not pieces:
+            return ""
+        result = "[" + ", ".join(pieces) + "]"
+        return f"{result}\n{marker}" if marker else result
+
+
+class CachedSQLDatabase(GuardedSQLDatabase):
+    """SQLDatabase whose SELECTs are answered from a NotesResultCache while the tables are unchanged"""
+
+    def __init__(self, *args, result_cache: NotesResultCache = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.result_cache = result_cache
+
+    def run(self, command, fetch="all", include_columns=False, *, parameters=None, execution_options=None):
+        cacheable = (
+            self.result_cache is not None
+            and NOTES_RESULT_CACHE_ENABLED
+            and isinstance(command, str)
+            and fetch != "cursor"
+            and is_read_only(command)
+        )
+        if not cacheable:
+            return super().run(command, fetch, include_columns,
+                               parameters=parameters, execution_options=execution_options)
+
+        sql = normalize_sql(command)
+        tables = self.result_cache.tables_in(sql)
+        key = (sql, repr(sorted((parameters or {}).items())), fetch, include_columns)
+        cached = self.result_cache.get(key, tables)
+        if cached is not None:
+            return cached
+        versions = self.result_cache.snapshot(tables)
+        result = super().run(command, fetch, include_columns,
+                             parameters=parameters, execution_options=execution_options)
+        self.result_cache.put(key, versions, result)
+        return result
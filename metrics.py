@@ -0,0 +1,286 @@
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy import event
+
+# add a Server-Timing header (and timings in the stream's done event) to chat responses
+METRICS_TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "0").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# spans finished during the current request: list of (name, seconds)
+request_trace = ContextVar("request_trace", default=None)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts, sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def totals(self) -> dict:
+        """label values -> (sum, count)"""
+        with self._lock:
+            return {key: (total, count) for key, (_, total, count) in self._series.items()}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        # callables returning {"name": (type, documentation, value)} rendered as gauges/counters
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, (kind, documentation, value) in collector().items():
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+span_duration = registry.register(Histogram(
+    "agent_span_duration_seconds", "Duration of instrumented agent, tool and database spans", ("span",)))
+span_errors = registry.register(Counter(
+    "agent_span_errors_total", "Spans that raised an exception", ("span",)))
+tool_duration = registry.register(Histogram(
+    "agent_tool_duration_seconds", "Duration of tool calls made by the agents", ("tool",)))
+tool_timeouts = registry.register(Counter(
+    "agent_tool_timeouts_total", "Tool calls abandoned after their timeout", ("tool",)))
+llm_duration = registry.register(Histogram(
+    "llm_call_duration_seconds", "Duration of single LLM calls", ("model",)))
+llm_tokens = registry.register(Counter(
+    "llm_tokens_total", "Tokens used by LLM calls", ("model", "type")))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Duration of SQL statements", ("db", "operation")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Duration of API requests", ("method", "route", "status")))
+
+
+def record(name: str, seconds: float):
+    """Add a finished span to the histogram and to the current request trace"""
+    span_duration.observe(seconds, span=name)
+    trace = request_trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        span_errors.inc(span=name)
+        raise
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def traced(name: str):
+    """Decorator form of span() for sync functions, coroutines and async generators"""
+
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with span(name):
+                    async for item in func(*args, **kwargs):
+                        yield item
+        elif inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with span(name):
+                    return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def server_timing(trace: list) -> str:
+    """Server-Timing header value, spans with the same name are summed"""
+    totals = {}
+    for name, seconds in trace:
+        total, count = totals.get(name, (0.0, 0))
+        totals[name] = (total + seconds, count + 1)
+    return ", ".join(
+        f'{re.sub(r"[^A-Za-z0-9_-]", "-", name)};dur={total * 1000:.1f};desc="{count}x"'
+        for name, (total, count) in totals.items()
+    )
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records LLM latency and token usage and tool latency for every LangChain run it sees"""
+
+    def __init__(self):
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, label):
+        with self._lock:
+            self._started[run_id] = (label, time.perf_counter())
+
+    def _finish(self, run_id):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is None:
+            return None, 0.0
+        label, start = started
+        return label, time.perf_counter() - start
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("kwargs", {}).get("model", "unknown")
+        self._start(run_id, model)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("kwargs", {}).get("model", "unknown")
+        self._start(run_id, model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        model, seconds = self._finish(run_id)
+        if model is None:
+            return
+        llm_duration.observe(seconds, model=model)
+        record(f"llm.{model}", seconds)
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if not input_tokens and not output_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("completion_tokens", 0)
+        llm_tokens.inc(input_tokens, model=model, type="input")
+        llm_tokens.inc(output_tokens, model=model, type="output")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        model, seconds = self._finish(run_id)
+        if model is not None:
+            llm_duration.observe(seconds, model=model)
+            span_errors.inc(span=f"llm.{model}")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name", "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        tool, seconds = self._finish(run_id)
+        if tool is not None:
+            tool_duration.observe(seconds, tool=tool)
+            record(f"tool.{tool}", seconds)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        tool, seconds = self._finish(run_id)
+        if tool is not None:
+            tool_duration.observe(seconds, tool=tool)
+            span_errors.inc(span=f"tool.{tool}")
+
+
+metrics_callback = MetricsCallbackHandler()
+
+
+def _statement_operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].lower() if words else ""
+
+
+def instrument_engine(engine, db: str):
+    """Time every statement executed on a (sync) engine, labelled by database and SQL verb"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        db_query_duration.observe(seconds, db=db, operation=_statement_operation(statement))
+        record(f"db.{db}", seconds)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
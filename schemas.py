@@ -5,6 +5,7 @@ from datetime import datetime
 
 class MessageSchema(BaseModel):
     id: str
+    seq: Optional[int] = None
     role: str
     content: str
     created_at: datetime
@@ -24,6 +25,31 @@ class SessionSchema(BaseModel):
         from_attributes = True
 
 
+class SessionDetailSchema(SessionSchema):
+    # messages hold one keyset page; pass the first/last seq as before/after for the next one
+    has_more: bool = False
+
+
+class SessionListItemSchema(BaseModel):
+    id: str
+    session_name: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    last_activity_at: Optional[datetime] = None
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_message_preview: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class SessionListResponse(BaseModel):
+    sessions: List[SessionListItemSchema]
+    # pass back as `cursor` to get the next page, None on the last page
+    next_cursor: Optional[str] = None
+
+
 class CreateSessionRequest(BaseModel):
     session_name: Optional[str] = None
 
@@ -43,3 +69,49 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
+
+
+class NoteSchema(BaseModel):
+    id: int
+    title: Optional[str] = None
+    content: str
+    created_at: datetime
+    updated_at: datetime
+    is_archived: bool
+    tags: List[str] = []
+
+
+class NoteSearchResult(BaseModel):
+    id: int
+    title: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+    is_archived: bool
+
+
+class CreateNoteRequest(BaseModel):
+    content: str
+    title: Optional[str] = None
+    tags: List[str] = []
+
+
+class UpdateNoteRequest(BaseModel):
+    # omitted fields are left unchanged, tags replaces the whole list
+    content: Optional[str] = None
+    title: Optional[str] = None
+    tags: Optional[List[str]] = None
+
+
+class OutboxEmailSchema(BaseModel):
+    id: int
+    recipient: str
+    subject: str
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    next_attempt_at: datetime
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,21 @@
+"""
+Databases are created in a temporary directory before any app module is imported:
+their engines are created at import time.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DB_DIR = tempfile.mkdtemp(prefix="agent-tests-")
+os.environ["SESSION_DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'sessions.db')}"
+os.environ["NOTES_DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'notes.db')}"
+os.environ["EMAIL_OUTBOX_DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'email_outbox.db')}"
+os.environ["NOTES_VECTOR_INDEX_DIR"] = os.path.join(DB_DIR, "notes_index")
+os.environ["ROUTER_ENABLED"] = "1"
+os.environ["ROUTER_CLASSIFIER"] = "0"
+os.environ["ROUTER_LOG_PATH"] = ""
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+sys.path.insert(0, ROOT)
@@ -0,0 +1,54 @@
+import pytest
+from agents.router import MAIN, NOTES_SERVICE, SQL_AGENT, route_query
+
+ROUTES = [
+    # not about the user's notes: the SQL agent must never see these
+    ("What are HTML meta tags?", MAIN),
+    ("How do git tags work?", MAIN),
+    ("What notes are in a C major chord?", MAIN),
+    ("count the notes in a C major scale", MAIN),
+    ("What's a good note-taking app?", MAIN),
+    ("create a note-taking template for lectures", MAIN),
+    ("write a note to my landlord saying the rent will be late", MAIN),
+    ("make notes on the french revolution", MAIN),
+    ("Add a tag line to my resume", MAIN),
+    ("update the tags in my blog post html", MAIN),
+    ("what are my options for notes in Obsidian", MAIN),
+    ("rename the tag line in my essay to something punchier", MAIN),
+    ("what did I write about the hiring plan", MAIN),
+    # depends on the conversation or another capability
+    ("delete that note", MAIN),
+    ("email my notes to anna@example.com", MAIN),
+    # note management
+    ("how many notes do I have", SQL_AGENT),
+    ("count my archived notes", SQL_AGENT),
+    ("what are my most used tags", SQL_AGENT),
+    ("which tags I used most", SQL_AGENT),
+    ("notes I took yesterday", SQL_AGENT),
+    ("add a note about milk", SQL_AGENT),
+    ("add a note: buy milk", SQL_AGENT),
+    ("create a new note titled plan", SQL_AGENT),
+    ("delete the note 'groceries'", SQL_AGENT),
+    ("delete the notes tagged draft", SQL_AGENT),
+    ("rename the tag ideas to brainstorm", SQL_AGENT),
+    # answered by a note tool directly
+    ("show notes tagged work", NOTES_SERVICE),
+    ("list my last 10 notes", NOTES_SERVICE),
+    ("search my notes for budget", NOTES_SERVICE),
+]
+
+
+@pytest.mark.parametrize("query, route", ROUTES)
+def test_route_query(query, route):
+    assert route_query(query, [])["route"] == route
+
+
+def test_follow_up_needs_the_main_agent():
+    history = [("human", "show notes tagged work"), ("ai", "...")]
+    assert route_query("and the ones tagged home?", history)["route"] == MAIN
+
+
+def test_notes_service_arguments():
+    decision = route_query("list my last 10 notes", [])
+    assert decision["tool"] == "list_recent_notes"
+    assert decision["args"] == {"limit": 10}
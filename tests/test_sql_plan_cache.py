@@ -0,0 +1,48 @@
+from agents.sql_plan_cache import SQLPlanCache, normalize_question, parameterize_sql
+
+
+def test_normalize_question():
+    assert normalize_question('Notes tagged "work" from the last 5 days?') == (
+        "notes tagged {0} from the last {1} days", ["work", "5"])
+
+
+def test_parameterize_text_and_number():
+    sql = "SELECT id, title FROM notes WHERE title LIKE '%budget%' ORDER BY id DESC LIMIT 3"
+    assert parameterize_sql(sql, ["budget", "3"]) == (
+        "SELECT id, title FROM notes WHERE title LIKE :p0 ORDER BY id DESC LIMIT :p1", ["%{}%", "{}"])
+
+
+def test_number_used_twice_is_refused():
+    sql = "SELECT id, title FROM notes WHERE is_archived = 1 ORDER BY id DESC LIMIT 1"
+    assert parameterize_sql(sql, ["1"]) is None
+
+
+def test_number_in_flag_is_refused():
+    sql = "SELECT id, title FROM notes WHERE is_archived = 1 ORDER BY id DESC LIMIT 5"
+    assert parameterize_sql(sql, ["1"]) is None
+
+
+def test_number_also_in_constant_literal_is_refused():
+    sql = "SELECT id FROM notes WHERE created_at >= datetime('now', '-1 day') AND id > 1"
+    assert parameterize_sql(sql, ["1"]) is None
+
+
+def test_writes_are_never_parameterized():
+    assert parameterize_sql("DELETE FROM notes WHERE id = 3", ["3"]) is None
+
+
+def test_store_refuses_change_requests_and_computed_dates():
+    cache = SQLPlanCache()
+    always = lambda sql, params: True
+    assert not cache.store("delete notes tagged work", 1, "SELECT id FROM notes", always)
+    assert not cache.store("notes from yesterday", 1, "SELECT id FROM notes WHERE created_at >= '2026-10-16'", always)
+    assert cache.store("notes since '2026-10-16'", 1, "SELECT id FROM notes WHERE created_at >= '2026-10-16'", always)
+
+
+def test_lookup_binds_the_new_question_values():
+    cache = SQLPlanCache()
+    sql = "SELECT id, title FROM notes ORDER BY id DESC LIMIT 3"
+    assert cache.store("show the last 3 note titles", 1, sql, lambda sql, params: True)
+    assert cache.lookup("show the last 7 note titles", 1) == (
+        "SELECT id, title FROM notes ORDER BY id DESC LIMIT :p0", {"p0": 7})
+    assert cache.lookup("show the last 7 note titles", 2) is None